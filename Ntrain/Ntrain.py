@@ -1,8 +1,8 @@
 import os
 import sys
+import sqlite3
 import pandas as pd
 from pandas import ExcelWriter
-from random import shuffle
 try:
     import Tkinter as Tk
 except ImportError:
@@ -11,21 +11,18 @@ import tkFont
 import tkMessageBox
 from xpinyin import Pinyin
 from tkFileDialog import askopenfilename
-from cjklib.reading import ReadingFactory
-import unicodedata
 import sys
 import math
 import webbrowser
 import pdb
+import deck
+import progress
+import session
+import shards
 
 pd.options.mode.chained_assignment = None  # default='warn'
 
 
-def to_tone_number(s):
-    table = {0x304: ord('1'), 0x301: ord('2'), 0x30c: ord('3'), 0x300: ord('4')}
-    return unicodedata.normalize('NFD', s).translate(table)
-
-
 class NTrain(Tk.Tk):
     def __init__(self, *args, **kwargs):
         Tk.Tk.__init__(self, *args, **kwargs)
@@ -79,7 +76,7 @@ class NTrain(Tk.Tk):
         self.bind('<Return>', self._start_game)
 
         self._p = Pinyin()
-        self._f = ReadingFactory()
+        self._progress = None
 
     def _get_file(self):
         # open dialogue to chose datafile
@@ -104,30 +101,37 @@ class NTrain(Tk.Tk):
         self._radio1.destroy()
         self._radio2.destroy()
 
-        self._save_reminder = 0
-        # load in data file
+        # load in data file, the workbook is only parsed if it changed since the last session,
+        # of a sharded deck only the shards with due or unlearned cards are read
         try:
-            self._vocTot = pd.read_excel(self._datafile)
+            if not os.path.exists(self._datafile):
+                raise IOError(self._datafile)
+            # progress since the deck was last exported is kept next to it
+            self._progress = progress.ProgressStore(self._datafile)
+            self._vocTot, self._annotations = shards.load_session_deck(self._datafile, self._progress,
+                                                                       self._n_cards, self._p)
         except:
             tkMessageBox.showinfo("Error", "File not found!", icon='warning')
             self._restart()
         #pdb.set_trace()
 
-        # get indices of all filled cards
-        filled_idx = self._vocTot[self._vocTot['Learned'] == 0].index.tolist()
-        del filled_idx[0]
-        # shuffle indices
-        self._renew_index(filled_idx)
+        # pick the cards that are due, grading is done by the session
+        self._session = session.Session(self._vocTot, self._annotations, self._n_cards,
+                                        self._radio_val.get(), self._progress)
         # setup new gui
         self._setup_game_gui()
         # start with first question
         self._show_next_question()
 
     def _setup_game_gui(self):
-        # labels for chinese symbols
+        # labels for chinese symbols, the labels are reused for every card
         self.C_labels = []
         # labels for questions
         self.Q_labels = []
+        # label for the english question
+        self._E_label = Tk.Label()
+        # number of characters of the current card
+        self._n_chars = 1
 
         # label for correct solution
         self._sol_label_value = Tk.StringVar()
@@ -149,6 +153,10 @@ class NTrain(Tk.Tk):
         self._save_button = Tk.Button(text="Save", command=self._save)
         self._save_button.grid(row=2, column=1, sticky=Tk.W)
 
+        # Export button, writes the progress into the Learned column of the deck
+        self._export_button = Tk.Button(text="Export", command=self._export)
+        self._export_button.grid(row=6, column=1, sticky=Tk.W)
+
         # Next button
         self._next_button = Tk.Button(text="Next", command=self._show_next_question)
         self._next_button.grid(row=3, column=1, sticky=Tk.W)
@@ -165,147 +173,77 @@ class NTrain(Tk.Tk):
         self._tr_button = Tk.Button(text="E-C", command=self._translate)
         self._tr_button.grid(row=5, column=1, sticky=Tk.W)
 
-        # initialize list of wrong cards
-        self._wrong_indices = []
         # initialize current index
         self._no = 0
 
-    def _renew_index(self, indices):
-        # TODO: catch too many cards chosen as input
-        shuffle(indices)
-        # take the first n cards
-        self._indices = indices[0:self._n_cards]
-
     def _show_next_question(self):
-        try:
-            # get the next index in the list
-            self._no = self._indices.pop(0)
+        # get the card of this session that is due first
+        no = self._session.next_card()
+        if no is None:
+            # finish the session when no card is left
+            self._exit()
+            return
+        self._no = no
 
-            # empty entry field
-            self._entry_value.set("")
-            # empty Q and C labels
-            for i in self.C_labels:
-                i.destroy()
-            for i in self.Q_labels:
-                i.destroy()
-            i = 1
-            self.C_labels = []
-            self.Q_labels = []
-
-            # loop over Chinese characters
-            for char in self._vocTot.C[self._no]:
-                my_pinyin = self._p.get_pinyin(char, ' ')
-                self.C_labels.append(Tk.Label(text=char))
-                self.C_labels[-1].grid(row=2, column=i + 1)
-                to_tone = (to_tone_number(my_pinyin))
-                if "1" in to_tone:
-                    self.C_labels[-1].config(fg='red')
-                elif "2" in to_tone:
-                    self.C_labels[-1].config(fg='green')
-                elif "3" in to_tone:
-                    self.C_labels[-1].config(fg='blue')
-                elif "4" in to_tone:
-                        self.C_labels[-1].config(fg='purple')
-                else:
-                    self.C_labels[-1].config(fg='grey')
-                if self._radio_val.get() == 1:
-                    self.Q_labels.append(Tk.Label(text=my_pinyin))
-                    self.Q_labels[-1].grid(row=1, column=i + 1)
-                i += 1
-
-            if self._radio_val.get() == 1:
-                self._curr_ans = self._vocTot.E[self._no].encode('utf-8')
-            elif self._radio_val.get() == 2:
-                try:
-                    my_english = self._vocTot.E_long[self._no].encode('utf-8')
-                except:
-                    my_english = self._vocTot.E[self._no].encode('utf-8')
-                self.Q_labels.append(Tk.Label(text=my_english))
-                self.Q_labels[-1].grid(row=1, column=2, columnspan=i - 1)
-                self._curr_ans = self._p.get_pinyin(self._vocTot.C[self._no], ' ')
-
-            self._entry.grid(row=4, column=2, columnspan=i - 1)
-
-            # set real_correct to default value of yes
-            self._real_correct = 1
-        except IndexError:
-            # start new round, when no card in list left
-            self._new_round()
+        # empty entry field
+        self._entry_value.set("")
+        # loop over Chinese characters, pinyin and tone colours are precomputed
+        characters = self._session.characters()
+        self._n_chars = max(len(characters), 1)
+        for label, (char, my_pinyin, colour) in zip(self._show_labels(self.C_labels, len(characters), 2), characters):
+            label.config(text=char, fg=colour)
+        if self._radio_val.get() == 1:
+            for label, (char, my_pinyin, colour) in zip(self._show_labels(self.Q_labels, len(characters), 1), characters):
+                label.config(text=my_pinyin)
+
+        if self._radio_val.get() == 2:
+            self._E_label.config(text=self._session.english())
+            self._E_label.grid(row=1, column=2, columnspan=self._n_chars)
+        self._curr_ans = self._session.solution()
+
+        self._entry.grid(row=4, column=2, columnspan=self._n_chars)
+
+    def _show_labels(self, labels, n, row):
+        # new labels are only created for words longer than all before,
+        # labels that are not needed for this card are hidden
+        while len(labels) < n:
+            labels.append(Tk.Label())
+            labels[-1].grid(row=row, column=len(labels) + 1)
+        for label in labels[:n]:
+            # grid remembers the position of hidden labels
+            label.grid()
+        for label in labels[n:]:
+            label.grid_remove()
+        return labels[:n]
 
     def _check_answer(self, *args):
 
-        # derive input
-        answer = self._entry_value.get().strip().lower()
-
-        # convert numbers, if provided, to pinjin tone mark
-        tone = 0
-        if any(char.isdigit() for char in answer):
-            tone = 1
-            answer = self._f.convert(answer, 'Pinyin', 'Pinyin', sourceOptions={'toneMarkType': 'numbers'}).encode('utf-8')
-
-        # derive expected answer
-        # ask for English word
-        if self._radio_val.get() == 1:
-            answer_to_check = self._curr_ans.encode('utf-8').lower()
-        # ask for Chinese word
-        elif self._radio_val.get() == 2:
-            # pinyin with tone marks
-            if tone == 1:
-                answer_to_check = self._p.get_pinyin(self._vocTot.C[self._no], ' ').encode('utf-8').lower()
-            # pinyin without tone marks
-            else:
-                answer_to_check = self._p.get_pinyin(self._vocTot.C[self._no], ' ').encode('utf-8').lower()
-
-        # check if answer is correct
-        if answer == answer_to_check:
-            # if correct: move to 'learned' columns
-            # move columns if card was correct on first attempt
-            if self._real_correct:
-                self._vocTot.Learned[self._no] = 1
-                self._save_reminder = 1
-
-            self._sol_label_value.set("")
+        # check if answer is correct, the session keeps track of first attempts
+        if self._session.check(self._entry_value.get()):
+            # show the correct spelling of close answers
+            self._sol_label_value.set(self._curr_ans if self._session.close else "")
             # if correct, go on to next card
             self._show_next_question()
         else:
-            # if wrong:
-            self._real_correct = 0
-            # store index in list of wrong cards
-            self._wrong_indices.append(self._no)
-            # display correct answer
+            # if wrong: display correct answer
             self._sol_label_value.set(self._curr_ans)
-            self._sol_label.grid(row=3, column=2, columnspan=len(self.C_labels))
+            self._sol_label.grid(row=3, column=2, columnspan=self._n_chars)
             # clear entry field
             self._entry_value.set("")
 
-    def _new_round(self):
-        # if wrong cards still left, start new round
-        if self._wrong_indices:
-            # empty all display fields
-            self._sol_label_value.set("New round!")
-            self._renew_index(self._wrong_indices)
-            # clear list of wrong indices
-            self._wrong_indices = []
-            # start new round with the next question
-            self._show_next_question()
-        else:
-            # if no wrong cards left, finish the session
-            self._exit()
-
     def _reset_list(self):
+        # the deck is left as it is, the progress store marks all cards as not learned
         self._datafile = os.path.join(os.path.dirname(os.path.abspath(__file__)), self._filename_value.get())
-        my_file = pd.read_excel(self._datafile)
-        my_file['Learned'] = 0
-        writer = ExcelWriter(self._datafile)
-        #pdb.set_trace()
-        my_file.to_excel(writer, 'Sheet1', index=False)
-        writer.save()
+        # no store is created for a deck that does not exist
+        if not os.path.exists(self._datafile):
+            tkMessageBox.showinfo("Error", "File not found!", icon='warning')
+            return
+        my_progress = progress.ProgressStore(self._datafile)
+        my_progress.reset()
+        my_progress.close()
 
     def _exit(self):
-        try:
-            self._save()
-        except:
-            self._sol_label_value.set("Didn't work?!")
+        if not self._save():
             return
         self._sol_label_value.set("")
         self._entry_value.set("")
@@ -316,22 +254,45 @@ class NTrain(Tk.Tk):
         self._next_button['state'] = 'disabled'
 
     def _save(self, *args):
-        writer = ExcelWriter(self._datafile)
-        self._vocTot.to_excel(writer, 'Sheet1', index=False)
-        writer.save()
+        # answers are saved in the background, wait until they are written,
+        # returns whether they were
+        try:
+            self._progress.flush()
+        except sqlite3.Error:
+            self._sol_label_value.set("Didn't work?!")
+            return False
         self._sol_label_value.set("Saved!")
-        self._sol_label.grid(row=3, column=2, columnspan=len(self.C_labels))
-        self._save_reminder = 0
+        self._sol_label.grid(row=3, column=2, columnspan=self._n_chars)
+        return True
+
+    def _export(self):
+        # rewrite the whole deck, only done on demand
+        try:
+            my_file = pd.read_excel(self._datafile)
+            # after a reset no card of the deck is learned, also not in shards that were not loaded
+            if self._progress.deck_reset():
+                my_file['Learned'] = 0
+            # cards of shards that were not loaded get their progress from the store
+            learned = dict((word, state[0]) for word, state in self._progress.states().items())
+            my_file['Learned'] = my_file['C'].map(learned).fillna(my_file['Learned'])
+            # a sharded deck has only the cards of this session loaded
+            my_file.loc[self._vocTot.index, 'Learned'] = self._vocTot.Learned
+            writer = ExcelWriter(self._datafile)
+            my_file.to_excel(writer, 'Sheet1', index=False)
+            writer.save()
+            deck.write_cache(self._datafile, my_file)
+            shards.update_shards(self._datafile, my_file)
+            self._progress.exported()
+        except:
+            self._sol_label_value.set("Didn't work?!")
+            return
+        self._sol_label_value.set("Exported!")
+        self._sol_label.grid(row=3, column=2, columnspan=self._n_chars)
 
     def _restart(self):
-        if self._save_reminder:
-            result = tkMessageBox.askquestion("Warning", "Save before exiting?")
-            if result == 'yes':
-                try:
-                    self._save()
-                except:
-                    self._sol_label_value.set("Didn't work?!")
-                    return
+        # write outstanding answers before the program is restarted
+        if self._progress is not None:
+            self._progress.close()
         python = sys.executable
         os.execl(python, python, * sys.argv)
 
@@ -347,7 +308,7 @@ class NTrain(Tk.Tk):
 
 
 def callback():
-    if tkMessageBox.askokcancel("Quit", "Do you really wish to quit? \nUnsaved changes may be lost."):
+    if tkMessageBox.askokcancel("Quit", "Do you really wish to quit?"):
         root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import re
+import unicodedata
+
+# increase when the annotations change, older sidecar files are rebuilt
+VERSION = 6
+
+# combining tone marks of pinyin and their tone numbers
+TONE_MARKS = {0x304: u'1', 0x301: u'2', 0x30c: u'3', 0x300: u'4'}
+TONE_COLOURS = [(u'1', 'red'), (u'2', 'green'), (u'3', 'blue'), (u'4', 'purple')]
+
+
+def to_tone_number(s):
+    table = {0x304: ord('1'), 0x301: ord('2'), 0x30c: ord('3'), 0x300: ord('4')}
+    return unicodedata.normalize('NFD', s).translate(table)
+
+
+def tone_colour(pinyin):
+    to_tone = to_tone_number(pinyin)
+    for number, colour in TONE_COLOURS:
+        if number in to_tone:
+            return colour
+    return 'grey'
+
+
+# lower case without accents and punctuation, e.g. u'Caf\xe9, (to) eat' -> u'cafe to eat'
+def fold(text):
+    text = unicodedata.normalize('NFD', u'%s' % text).lower()
+    text = u''.join(c if c.isalnum() else u' ' for c in text if not unicodedata.combining(c))
+    return u' '.join(text.split())
+
+
+# folded english answers that are accepted for a card: the whole text and
+# every part separated by , ; or /, with and without notes in brackets and
+# with and without a leading "to"
+def english_variants(*texts):
+    variants = []
+    for text in texts:
+        # empty cells are nan
+        if isinstance(text, float):
+            continue
+        text = u'%s' % text
+        for part in [text] + re.split(u'[,;/]', text):
+            for variant in (fold(part), fold(re.sub(u'\\(.*?\\)', u' ', part))):
+                if variant.startswith(u'to '):
+                    variants.append(variant[3:])
+                variants.append(variant)
+    # without duplicates, in order
+    return [v for i, v in enumerate(variants) if v and v not in variants[:i]]
+
+
+# letters of pinyin, the tones by the position of their letter and the
+# positions at which syllables end. A tone mark belongs to its vowel, a tone
+# number to the letter before it. u with umlaut is written as v.
+def _pinyin_letters(pinyin):
+    letters = []
+    tones = {}
+    ends = set()
+    for c in unicodedata.normalize('NFD', u'%s' % pinyin).lower():
+        if ord(c) in TONE_MARKS:
+            if letters:
+                tones[len(letters) - 1] = TONE_MARKS[ord(c)]
+        elif ord(c) == 0x308:
+            # u with umlaut is decomposed into u and a diaeresis
+            if letters and letters[-1] == u'u':
+                letters[-1] = u'v'
+        elif u'a' <= c <= u'z':
+            letters.append(c)
+        elif letters:
+            # tone numbers, the neutral tone 5 or 0, spaces and apostrophes end a syllable
+            if c in u'1234':
+                tones[len(letters) - 1] = c
+            ends.add(len(letters))
+    ends.add(len(letters))
+    return u''.join(letters), tones, ends
+
+
+# Key of pinyin written with tone marks or tone numbers: xi huan with a tone
+# mark on the first i, xi3 huan and Xi3huan5 all give u'xi3|huan'. The
+# syllables are split at spaces and tone numbers, or as in reference if it
+# has the same letters, so a tone on the wrong syllable gives a different
+# key. A syllable without a tone has the neutral tone.
+def pinyin_key(pinyin, reference=None):
+    letters, tones, ends = _pinyin_letters(pinyin)
+    if reference is not None:
+        reference_letters, _, reference_ends = _pinyin_letters(reference)
+        if reference_letters == letters:
+            ends = reference_ends
+    syllables = []
+    start = 0
+    for end in sorted(ends):
+        if end > start:
+            syllables.append(letters[start:end] + u''.join(tones[i] for i in range(start, end) if i in tones))
+        start = end
+    return u'|'.join(syllables)
+
+
+# pinyin with tone marks
+def toned_pinyin(p, chars):
+    try:
+        return p.get_pinyin(chars, ' ', tone_marks='marks')
+    except TypeError:
+        # xpinyin before 0.5.6
+        return p.get_pinyin(chars, ' ', show_tone_marks=True)
+
+
+# pinyin of every character, from the P column of the deck if it has one
+# syllable per character, otherwise from xpinyin
+def character_pinyin(p, word, pinyin=float('nan')):
+    if not isinstance(pinyin, float):
+        syllables = (u'%s' % pinyin).split()
+        if len(syllables) == len(word):
+            return syllables
+    return [toned_pinyin(p, char) for char in word]
+
+
+# everything needed to show and check a card
+def annotate_card(p, word, english, english_long=float('nan'), deck_pinyin=float('nan')):
+    pinyin = character_pinyin(p, word, deck_pinyin)
+    word_pinyin = toned_pinyin(p, word) if isinstance(deck_pinyin, float) else u'%s' % deck_pinyin
+    return {'pinyin': pinyin,
+            'colours': [tone_colour(x) for x in pinyin],
+            'word_pinyin': word_pinyin,
+            # split into the syllables of the characters
+            'pinyin_key': pinyin_key(word_pinyin, u' '.join(pinyin)),
+            'english_variants': english_variants(english, english_long)}
+
+
+# a column of a deck, empty if the deck does not have it
+def _column(deck, name):
+    if name in deck:
+        return deck[name]
+    return [float('nan')] * len(deck)
+
+
+# hash of the columns the annotations are made from, the Learned column can change
+def deck_hash(deck):
+    h = hashlib.sha1()
+    for row in zip(deck.C, deck.E, _column(deck, 'E_long'), _column(deck, 'P')):
+        h.update((u'%s\t%s\t%s\t%s\n' % row).encode('utf-8'))
+    return h.hexdigest()
+
+
+class Annotations(object):
+    # Pinyin, tone colours and normalized answers of every word of a deck.
+    # They are computed once and kept in a sidecar file next to the deck
+    # (deck.xlsx -> deck.annotations.json), which is rebuilt when the words
+    # of the deck change.
+    def __init__(self, deckfile, deck, p):
+        self.filename = os.path.splitext(deckfile)[0] + '.annotations.json'
+        key = deck_hash(deck)
+        self.cards = self._load(key)
+        if self.cards is None:
+            self.cards = {}
+            for word, english, english_long, pinyin in zip(deck.C, deck.E, _column(deck, 'E_long'),
+                                                           _column(deck, 'P')):
+                # skip empty rows
+                if isinstance(word, float) or isinstance(english, float):
+                    continue
+                self.cards[word] = annotate_card(p, word, english, english_long, pinyin)
+            self._save(key)
+
+    def __getitem__(self, word):
+        return self.cards[word]
+
+    def _load(self, key):
+        try:
+            with open(self.filename, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        if data.get('version') != VERSION or data.get('hash') != key:
+            return None
+        return data['cards']
+
+    def _save(self, key):
+        tmp = self.filename + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump({'version': VERSION, 'hash': key, 'cards': self.cards}, f)
+            # os.rename does not replace files on windows
+            if os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        except (IOError, OSError):
+            pass
@@ -0,0 +1,99 @@
+import argparse
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+import pandas as pd
+import annotate
+import progress
+import session
+from xpinyin import Pinyin
+
+# common characters to build synthetic words from
+CHARACTERS = u'的一是不了人我在有他这中大来上国个到说们为子和你地出道也时年得就那要下以生会自着去之过家学对可里后小么心多天而能好都然没日于起还发成事只作当想看文无开手十用主行方又如前所本见经头面公同三已老从动两长'
+
+
+# random deck in the format of chinese100.xlsx
+def synthetic_deck(n_cards, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < n_cards:
+        words.add(u''.join(rng.choice(CHARACTERS) for _ in range(rng.randint(1, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return pd.DataFrame({'E': ['word%d' % i for i in range(n_cards)],
+                         'C': words,
+                         'E_long': ['word%d, long' % i for i in range(n_cards)],
+                         'Learned': 0}, columns=['E', 'C', 'E_long', 'Learned'])
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+# peak resident memory of the process in MB
+def peak_memory():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024. / 1024. if os.uname()[0] == 'Darwin' else rss / 1024.
+
+
+# Replay simulated answers against a synthetic deck: every card is answered
+# right with probability accuracy, wrong cards are answered right on the
+# second attempt. Reports the latency of showing and grading a card.
+def bench_session(n_cards, n_answers, accuracy=0.8, mode=session.CH_TO_E, store=False, seed=0):
+    directory = tempfile.mkdtemp()
+    try:
+        deckfile = os.path.join(directory, 'deck.xlsx')
+        vocab = synthetic_deck(n_cards, seed)
+        start = time.time()
+        annotations = annotate.Annotations(deckfile, vocab, Pinyin())
+        t_annotate = time.time() - start
+        my_progress = progress.ProgressStore(deckfile) if store else None
+        start = time.time()
+        drill = session.Session(vocab, annotations, n_answers, mode, my_progress)
+        t_session = time.time() - start
+
+        rng = random.Random(seed)
+        latencies = []
+        while True:
+            start = time.time()
+            if drill.next_card() is None:
+                break
+            drill.characters()
+            right = drill.solution()
+            answer = right if rng.random() < accuracy else u'wrong'
+            if not drill.check(answer):
+                drill.check(right)
+            latencies.append(time.time() - start)
+        if my_progress is not None:
+            start = time.time()
+            my_progress.close()
+            t_flush = time.time() - start
+        else:
+            t_flush = 0.
+    finally:
+        shutil.rmtree(directory)
+    return {'annotate': t_annotate, 'session': t_session, 'flush': t_flush, 'cards shown': len(latencies),
+            'median': percentile(latencies, 0.5), 'p99': percentile(latencies, 0.99), 'max': max(latencies)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Ntrain session engine on synthetic decks.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000], help='number of cards in the deck')
+    parser.add_argument('--answers', type=int, default=5000, help='number of cards in the session')
+    parser.add_argument('--progress', action='store_true', help='record the answers in a progress store')
+    args = parser.parse_args()
+    print('%8s %13s %13s %11s %8s %12s %12s %12s %10s' % ('cards', 'annotate [s]', 'session [s]', 'flush [s]',
+                                                          'shown', 'median [us]', 'p99 [us]', 'max [us]', 'peak [MB]'))
+    for n_cards in args.sizes:
+        r = bench_session(n_cards, min(args.answers, n_cards - 1), store=args.progress)
+        print('%8d %13.2f %13.3f %11.3f %8d %12.1f %12.1f %12.1f %10.1f' % (
+            n_cards, r['annotate'], r['session'], r['flush'], r['cards shown'],
+            r['median'] * 1e6, r['p99'] * 1e6, r['max'] * 1e6, peak_memory()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import json
+import os
+import pandas as pd
+
+# columns that are used for drilling, other columns stay in the workbook only
+COLUMNS = ['C', 'E', 'P', 'E_long', 'Learned']
+VERSION = 3
+# columns that hold text, cells with numbers are written as text
+TEXT_COLUMNS = ['C', 'E', 'P', 'E_long']
+
+
+def cache_files(deckfile):
+    base = os.path.splitext(deckfile)[0]
+    return base + '.cache.json', base + '.cache'
+
+
+def deck_stamp(deckfile):
+    stat = os.stat(deckfile)
+    return {'version': VERSION, 'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+# the drilling columns of a workbook, feather files have no index, the row
+# numbers of the workbook are kept as a column
+def drill_frame(deck):
+    frame = deck.reindex(columns=COLUMNS)
+    for column in TEXT_COLUMNS:
+        frame[column] = frame[column].map(lambda value: value if pd.isnull(value) else u'%s' % value)
+    frame['Learned'] = frame['Learned'].fillna(0).astype(int)
+    frame.insert(0, 'row', frame.index)
+    return frame.reset_index(drop=True)
+
+
+# write a frame to data_file + .feather if pyarrow is installed and can
+# convert it, to a pickle otherwise, returns the format
+def write_frame(data_file, frame):
+    try:
+        frame.to_feather(data_file + '.feather')
+        return 'feather'
+    except (IOError, OSError):
+        raise
+    except Exception:
+        # pyarrow is missing or raised one of its own errors
+        frame.to_pickle(data_file + '.pkl', protocol=2)
+        return 'pickle'
+
+
+def read_frame(data_file, format):
+    if format == 'feather':
+        return pd.read_feather(data_file + '.feather')
+    return pd.read_pickle(data_file + '.pkl')
+
+
+# write the drilling columns of a deck to a columnar file next to it
+def write_cache(deckfile, deck):
+    meta_file, data_file = cache_files(deckfile)
+    meta = deck_stamp(deckfile)
+    try:
+        meta['format'] = write_frame(data_file, drill_frame(deck))
+        with open(meta_file, 'w') as f:
+            json.dump(meta, f)
+    except (IOError, OSError):
+        pass
+
+
+def _read_cache(deckfile):
+    meta_file, data_file = cache_files(deckfile)
+    try:
+        with open(meta_file, 'r') as f:
+            meta = json.load(f)
+        stamp = deck_stamp(deckfile)
+        if any(meta.get(key) != stamp[key] for key in stamp):
+            return None
+        return read_frame(data_file, meta['format'])
+    except (IOError, OSError, ValueError, KeyError, ImportError):
+        return None
+
+
+# Load the C, E, P, E_long and Learned columns of a deck. The workbook is only
+# parsed if it changed since the cache was written, the rows keep their
+# index in the workbook. With unlearned=True only the rows with Learned == 0
+# are returned.
+def load_deck(deckfile, unlearned=False):
+    frame = _read_cache(deckfile)
+    if frame is None:
+        write_cache(deckfile, pd.read_excel(deckfile))
+        frame = _read_cache(deckfile)
+    if frame is None:
+        # the cache could not be written
+        frame = pd.read_excel(deckfile).reindex(columns=COLUMNS)
+        frame.insert(0, 'row', frame.index)
+    if unlearned:
+        frame = frame[frame['Learned'] == 0]
+    return frame.set_index('row').rename_axis(None)
@@ -0,0 +1,51 @@
+# edit distance counting a typo, a missing or an extra letter and two swapped letters as one edit
+def distance(a, b):
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+    return row[-1]
+
+
+class AnswerIndex(object):
+    # Accepted answers of all cards of a deck by their normalized key. An
+    # answer that is accepted for another card is wrong, an answer that is
+    # not accepted for any card is close if it is at least min_length letters
+    # long and within max_distance edits of an answer of the card. Looking up
+    # an answer takes a dict lookup and a comparison with the answers of one
+    # card, independent of the size of the deck.
+    def __init__(self, max_distance=1, min_length=4):
+        self.max_distance = max_distance
+        self.min_length = min_length
+        # cards by accepted answer and accepted answers by card
+        self.cards = {}
+        self.answers = {}
+
+    def __len__(self):
+        return len(self.answers)
+
+    def add(self, card, keys):
+        for key in keys:
+            self.cards.setdefault(key, set()).add(card)
+        self.answers.setdefault(card, []).extend(keys)
+
+    # 0 if one of the keys of an answer is accepted for the card, the number
+    # of edits if the answer is close to an answer of the card and None if
+    # the answer is wrong
+    def match(self, card, keys):
+        for key in keys:
+            if key in self.cards:
+                return 0 if card in self.cards[key] else None
+        key = keys[0]
+        if self.max_distance < 1 or len(key) < self.min_length:
+            return None
+        edits = [distance(key, answer) for answer in self.answers.get(card, ())
+                 if abs(len(answer) - len(key)) <= self.max_distance]
+        if edits and min(edits) <= self.max_distance:
+            return min(edits)
+        return None
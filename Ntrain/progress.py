@@ -0,0 +1,119 @@
+import atexit
+import os
+import sqlite3
+import threading
+import time
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+
+class ProgressStore(object):
+    # Learning progress of a deck in a sqlite database next to it
+    # (deck.xlsx -> deck.progress.sqlite). Every graded answer is logged as a
+    # review event and the scheduler state of the card is updated. Writes are
+    # queued and committed by a background thread, so the Tk loop never waits
+    # for the disk. Cards are identified by their Chinese word.
+    def __init__(self, deckfile):
+        self.filename = os.path.splitext(deckfile)[0] + '.progress.sqlite'
+        con = self._connect()
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS reviews (card TEXT, time REAL, quality INTEGER);
+            CREATE TABLE IF NOT EXISTS cards (card TEXT PRIMARY KEY, learned INTEGER,
+                ease REAL, interval REAL, reps INTEGER, due REAL);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        con.commit()
+        con.close()
+        self._queue = queue.Queue()
+        # writes that failed are retried with the next batch, flush raises the error
+        self._failed = []
+        self.error = None
+        self._thread = threading.Thread(target=self._write_loop)
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        return sqlite3.connect(self.filename)
+
+    # scheduler state and learned flag of all cards with progress
+    def states(self):
+        self._queue.join()
+        con = self._connect()
+        rows = con.execute('SELECT card, learned, ease, interval, reps, due FROM cards').fetchall()
+        con.close()
+        return dict((row[0], row[1:]) for row in rows)
+
+    # True after reset: the Learned column of the deck is out of date
+    def deck_reset(self):
+        self._queue.join()
+        con = self._connect()
+        row = con.execute("SELECT value FROM meta WHERE key = 'reset'").fetchone()
+        con.close()
+        return row is not None
+
+    # log a graded answer, state is the scheduler.CardState of the card after the review
+    def record(self, card, quality, state, learned):
+        self._queue.put((
+            ('INSERT INTO reviews VALUES (?, ?, ?)', (card, time.time(), quality)),
+            ('INSERT OR REPLACE INTO cards VALUES (?, ?, ?, ?, ?, ?)',
+             (card, learned, state.ease, state.interval, state.reps, state.due)),
+        ))
+
+    # forget all progress, the review log is kept
+    def reset(self):
+        self._queue.put((
+            ('DELETE FROM cards', ()),
+            ("INSERT OR REPLACE INTO meta VALUES ('reset', ?)", (str(time.time()),)),
+        ))
+        self.flush()
+
+    # the deck has been exported with the current progress
+    def exported(self):
+        self._queue.put((("DELETE FROM meta WHERE key = 'reset'", ()),))
+        self.flush()
+
+    # wait until all queued writes are committed, raises the sqlite3.Error
+    # if writes could not be committed, they are kept to be retried
+    def flush(self):
+        if self._failed:
+            # retry without waiting for the next answer
+            self._queue.put(())
+        self._queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    # commit everything that is queued in one transaction
+    def _write_loop(self):
+        con = self._connect()
+        while True:
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batch = self._failed + [item for item in items if item is not None]
+            try:
+                with con:
+                    for item in batch:
+                        for statement, params in item:
+                            con.execute(statement, params)
+                self._failed = []
+                self.error = None
+            except sqlite3.Error as e:
+                # e.g. the database is locked, the session goes on and the writes are retried
+                self._failed = batch
+                self.error = e
+            for _ in items:
+                self._queue.task_done()
+            if None in items:
+                con.close()
+                return
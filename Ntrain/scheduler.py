@@ -0,0 +1,113 @@
+import heapq
+import itertools
+import time
+
+DAY = 24 * 60 * 60.
+
+
+class CardState(object):
+    # SM-2 state of a card: ease factor, interval in days, number of
+    # successful reviews in a row and the time the card is due again
+    __slots__ = ('ease', 'interval', 'reps', 'due', 'version')
+
+    def __init__(self, ease=2.5, interval=0., reps=0, due=0.):
+        self.ease = ease
+        self.interval = interval
+        self.reps = reps
+        self.due = due
+        self.version = 0
+
+
+class Scheduler(object):
+    # Spaced repetition scheduler. Cards are kept in a heap ordered by the
+    # time they are due, so that the next card is found in O(log n). Cards
+    # are only referred to by their index in the deck, the deck rows are
+    # looked up by the caller for the cards that are actually shown.
+    def __init__(self, learning_step=30.):
+        # wrong cards come back after learning_step seconds
+        self.learning_step = learning_step
+        self._heap = []
+        self._cards = {}
+        # tie breaker, cards with the same due time come in the order they were added
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._cards)
+
+    def __contains__(self, card):
+        return card in self._cards
+
+    def state(self, card):
+        return self._cards[card]
+
+    def add(self, card, ease=2.5, interval=0., reps=0, due=0.):
+        self._cards[card] = CardState(ease, interval, reps, due)
+        self._push(card)
+
+    def _push(self, card):
+        state = self._cards[card]
+        # entries of earlier versions of a card are skipped when they come up
+        state.version += 1
+        heapq.heappush(self._heap, (state.due, next(self._counter), state.version, card))
+
+    # drop heap entries of cards that have been rescheduled or removed
+    def _clean(self):
+        while self._heap:
+            due, _, version, card = self._heap[0]
+            state = self._cards.get(card)
+            if state is not None and state.version == version:
+                return
+            heapq.heappop(self._heap)
+
+    # earliest (due, card) without removing it, None if empty
+    def peek(self):
+        self._clean()
+        if not self._heap:
+            return None
+        return self._heap[0][0], self._heap[0][3]
+
+    # remove and return the card that is due first, None if there is
+    # no card or, if now is given, no card is due at that time
+    def pop(self, now=None):
+        self._clean()
+        if not self._heap or (now is not None and self._heap[0][0] > now):
+            return None
+        return heapq.heappop(self._heap)[3]
+
+    # up to limit cards that are due at time now, in the order they are due
+    def pop_due(self, now=None, limit=None):
+        now = time.time() if now is None else now
+        cards = []
+        while limit is None or len(cards) < limit:
+            card = self.pop(now)
+            if card is None:
+                break
+            cards.append(card)
+        return cards
+
+    def remove(self, card):
+        self._cards.pop(card, None)
+
+    # SM-2 update after a review with quality 0 (blackout) to 5 (perfect),
+    # quality below 3 counts as wrong, returns the new due time
+    def review(self, card, quality, now=None):
+        now = time.time() if now is None else now
+        if card not in self._cards:
+            self._cards[card] = CardState()
+        state = self._cards[card]
+        if quality >= 3:
+            if state.reps == 0:
+                state.interval = 1.
+            elif state.reps == 1:
+                state.interval = 6.
+            else:
+                state.interval = round(state.interval * state.ease)
+            state.reps += 1
+            state.due = now + state.interval * DAY
+        else:
+            state.reps = 0
+            state.interval = 0.
+            state.due = now + self.learning_step
+        state.ease = max(1.3, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+        self._push(card)
+        return state.due
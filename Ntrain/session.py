@@ -0,0 +1,168 @@
+import argparse
+import time
+from random import shuffle
+import annotate
+import fuzzy
+import scheduler
+
+# question modes, as the radio buttons of NTrain
+CH_TO_E = 1
+E_TO_CH = 2
+
+
+class Session(object):
+    # A drill session without any gui: picks the cards that are due, grades
+    # answers and keeps the progress. NTrain shows the cards of a session in
+    # Tk, the command line mode below in the terminal.
+    def __init__(self, vocab, annotations, n_cards=30, mode=CH_TO_E, progress=None, now=None):
+        self.vocab = vocab
+        self.annotations = annotations
+        self.mode = mode
+        self.progress = progress
+        now = time.time() if now is None else now
+
+        # progress since the deck was last exported
+        states = {}
+        if progress is not None:
+            if progress.deck_reset():
+                vocab['Learned'] = 0
+            states = progress.states()
+        reviewed = [(idx, states[word]) for idx, word in zip(vocab.index, vocab.C) if word in states]
+        for idx, state in reviewed:
+            vocab.at[idx, 'Learned'] = state[0]
+
+        # get indices of all filled cards
+        filled_idx = vocab[vocab['Learned'] == 0].index.tolist()
+        del filled_idx[:1]
+        # shuffle indices, new cards are due now and come up in this order
+        shuffle(filled_idx)
+        self.scheduler = scheduler.Scheduler()
+        words = vocab.C.to_dict()
+        for idx in filled_idx:
+            if words[idx] not in states:
+                self.scheduler.add(idx, due=now)
+        # cards that have been reviewed before are due according to their progress
+        for idx, (learned, ease, interval, reps, due) in reviewed:
+            self.scheduler.add(idx, ease, interval, reps, due)
+
+        # answers of all cards, an answer to another card of the deck is never close
+        if mode == CH_TO_E:
+            self.answers = fuzzy.AnswerIndex()
+        else:
+            # tones are graded: only the pinyin with the tones of the card is accepted,
+            # an answer without tones only for cards that have the neutral tone only
+            self.answers = fuzzy.AnswerIndex(max_distance=0)
+        for word in set(words.values()):
+            # empty rows have no annotations
+            if word in annotations.cards:
+                card = annotations[word]
+                self.answers.add(word, card['english_variants'] if mode == CH_TO_E else [card['pinyin_key']])
+
+        # cards of this session, wrong cards are put back to come up again a bit later
+        self.queue = scheduler.Scheduler()
+        for idx in self.scheduler.pop_due(now, limit=n_cards):
+            self.queue.add(idx)
+        self.no = None
+        self.card = None
+        self.first_attempt = True
+        self.close = False
+
+    def __len__(self):
+        return len(self.queue)
+
+    # move to the card that is due first, returns its index or None at the end of the session
+    def next_card(self):
+        self.no = self.queue.pop()
+        if self.no is None:
+            self.card = None
+            return None
+        self.card = self.annotations[self.vocab.C[self.no]]
+        self.first_attempt = True
+        return self.no
+
+    # characters, their pinyin and tone colours of the current card
+    def characters(self):
+        return list(zip(self.vocab.C[self.no], self.card['pinyin'], self.card['colours']))
+
+    # english question for E_TO_CH, the long form if the deck has one
+    def english(self):
+        english = self.vocab.E_long[self.no] if 'E_long' in self.vocab else float('nan')
+        # empty cells are nan
+        if isinstance(english, float):
+            english = self.vocab.E[self.no]
+        return english
+
+    # the answer that is shown after a wrong attempt
+    def solution(self):
+        if self.mode == CH_TO_E:
+            return self.vocab.E[self.no]
+        return self.card['word_pinyin']
+
+    # normalized keys of an answer to look up in the answer index
+    def keys(self, answer):
+        if self.mode == CH_TO_E:
+            return [annotate.fold(answer)]
+        # the syllables of the characters tell which syllable a tone belongs to
+        return [annotate.pinyin_key(answer, u' '.join(self.card['pinyin']))]
+
+    # grade an answer to the current card, only the first attempt counts for the
+    # schedule, a wrong card comes up again later in the session. Close answers
+    # are correct, self.close is set to show the solution nevertheless.
+    def check(self, answer):
+        edits = self.answers.match(self.vocab.C[self.no], self.keys(answer))
+        correct = edits is not None
+        self.close = bool(edits)
+        if self.first_attempt:
+            if correct:
+                self.vocab.at[self.no, 'Learned'] = 1
+                self.review(4 if self.close else 5)
+            else:
+                self.review(1)
+                self.queue.review(self.no, 1)
+        self.first_attempt = self.first_attempt and correct
+        return correct
+
+    def review(self, quality):
+        self.scheduler.review(self.no, quality)
+        # the progress store writes in the background
+        if self.progress is not None:
+            self.progress.record(self.vocab.C[self.no], quality, self.scheduler.state(self.no),
+                                 int(self.vocab.Learned[self.no]))
+
+
+# drill in the terminal
+def main():
+    import progress
+    import shards
+    from xpinyin import Pinyin
+    try:
+        read = raw_input
+    except NameError:
+        read = input
+    parser = argparse.ArgumentParser(description='Drill a deck in the terminal.')
+    parser.add_argument('deckfile')
+    parser.add_argument('-n', '--cards', type=int, default=30, help='number of cards')
+    parser.add_argument('--reverse', action='store_true', help='ask for the pinyin of english words')
+    args = parser.parse_args()
+    my_progress = progress.ProgressStore(args.deckfile)
+    vocab, annotations = shards.load_session_deck(args.deckfile, my_progress, args.cards, Pinyin())
+    session = Session(vocab, annotations, args.cards, E_TO_CH if args.reverse else CH_TO_E, my_progress)
+    try:
+        while session.next_card() is not None:
+            if session.mode == CH_TO_E:
+                print(u' '.join(u'%s %s' % (char, pinyin) for char, pinyin, _ in session.characters()))
+            else:
+                print(session.english())
+            while not session.check(read('> ')):
+                print(session.solution())
+            if session.close:
+                print(session.solution())
+    except (EOFError, KeyboardInterrupt):
+        # stopped early, the answers so far are kept
+        print('')
+        return
+    print('Done!')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import pandas as pd
+import annotate
+import deck
+
+# default number of cards per shard
+SHARD_SIZE = 2000
+
+
+def shard_dir(deckfile):
+    return os.path.splitext(deckfile)[0] + '.shards'
+
+
+def _manifest_file(deckfile):
+    return os.path.join(shard_dir(deckfile), 'manifest.json')
+
+
+def _read_manifest(deckfile):
+    try:
+        with open(_manifest_file(deckfile), 'r') as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+# Split the drilling columns of a workbook into shards of at most size cards
+# in a folder next to it (deck.xlsx -> deck.shards/). With by, e.g. a Level
+# or Tag column, every shard holds cards of one value only, in the order the
+# values first appear in the workbook. The manifest lists the words and the
+# unlearned words of every shard, so the shards for a session can be picked
+# without reading them.
+def write_shards(deckfile, vocab, by=None, size=SHARD_SIZE):
+    frame = deck.drill_frame(vocab)
+    keys = vocab[by].fillna('').astype(str).values if by else [''] * len(frame)
+    keys = pd.Series(keys, index=frame.index)
+    directory = shard_dir(deckfile)
+    tmp = directory + '.tmp'
+    if os.path.exists(tmp):
+        shutil.rmtree(tmp)
+    os.mkdir(tmp)
+    manifest = {'deck': deck.deck_stamp(deckfile), 'by': by, 'size': size, 'shards': []}
+    for key in pd.unique(keys):
+        group = frame[keys == key]
+        for start in range(0, len(group), size):
+            chunk = group.iloc[start:start + size].reset_index(drop=True)
+            name = '%03d' % len(manifest['shards'])
+            manifest['shards'].append({
+                'name': name,
+                'key': key,
+                'format': deck.write_frame(os.path.join(tmp, name), chunk),
+                'words': chunk.C.tolist(),
+                'unlearned': chunk.C[chunk.Learned == 0].tolist()})
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(tmp, directory)
+
+
+# split a deck again after it was changed, if it is sharded
+def update_shards(deckfile, vocab):
+    manifest = _read_manifest(deckfile)
+    if manifest is not None:
+        write_shards(deckfile, vocab, manifest['by'], manifest['size'])
+
+
+def open_shards(deckfile):
+    if _read_manifest(deckfile) is None:
+        return None
+    return ShardedDeck(deckfile)
+
+
+class ShardedDeck(object):
+    # Merged view of the shards of a deck. For a session only the shards with
+    # cards that are due or not learned yet are read: all shards with due
+    # cards and then, in the order of the deck, shards with unlearned cards
+    # until there are enough for the session. The shards are split again if
+    # the workbook changed.
+    def __init__(self, deckfile):
+        self.deckfile = deckfile
+        self.directory = shard_dir(deckfile)
+        self.manifest = _read_manifest(deckfile)
+        if self.manifest['deck'] != deck.deck_stamp(deckfile):
+            write_shards(deckfile, pd.read_excel(deckfile), self.manifest['by'], self.manifest['size'])
+            self.manifest = _read_manifest(deckfile)
+        self.frames = {}
+
+    def __len__(self):
+        return sum(len(shard['words']) for shard in self.manifest['shards'])
+
+    def _read(self, shard):
+        if shard['name'] not in self.frames:
+            self.frames[shard['name']] = deck.read_frame(os.path.join(self.directory, shard['name']),
+                                                         shard['format'])
+        return self.frames[shard['name']]
+
+    # shards holding the cards of a session
+    def pick(self, states, n_cards, reset=False, now=None):
+        now = time.time() if now is None else now
+        due = set(word for word, state in states.items() if state[4] <= now)
+        learned = set(word for word, state in states.items() if state[0])
+        picked = []
+        n_new = 0
+        for shard in self.manifest['shards']:
+            if due.intersection(shard['words']):
+                picked.append(shard)
+        for shard in self.manifest['shards']:
+            if n_new > n_cards:
+                break
+            # after a reset all cards without progress are new
+            unlearned = shard['words'] if reset else shard['unlearned']
+            new = len([word for word in unlearned if word not in learned])
+            if new and shard not in picked:
+                picked.append(shard)
+            n_new += new
+        return picked
+
+    # Load the cards of a session like deck.load_deck, with the progress of
+    # progress. Returns the cards of the picked shards, indexed by their row
+    # in the workbook.
+    def load(self, progress, n_cards, now=None):
+        states = progress.states() if progress is not None else {}
+        reset = progress.deck_reset() if progress is not None else False
+        frames = [self._read(shard) for shard in self.pick(states, n_cards, reset, now)]
+        if not frames:
+            frames = [self._read(self.manifest['shards'][0])]
+        frame = pd.concat(frames, ignore_index=True).sort_values('row')
+        return frame.set_index('row').rename_axis(None)
+
+    # annotations of the loaded shards, every shard has its own sidecar file
+    def annotations(self, p):
+        merged = None
+        for name, frame in sorted(self.frames.items()):
+            shard_annotations = annotate.Annotations(os.path.join(self.directory, name), frame, p)
+            if merged is None:
+                merged = shard_annotations
+            else:
+                merged.cards.update(shard_annotations.cards)
+        return merged
+
+
+# the cards for a session and their annotations, only the shards that are
+# needed if the deck is sharded
+def load_session_deck(deckfile, progress, n_cards, p):
+    sharded = open_shards(deckfile)
+    if sharded is None:
+        vocab = deck.load_deck(deckfile)
+        return vocab, annotate.Annotations(deckfile, vocab, p)
+    vocab = sharded.load(progress, n_cards)
+    return vocab, sharded.annotations(p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Split a deck into shards, sessions only read the shards they need.')
+    parser.add_argument('deckfile')
+    parser.add_argument('--by', help='column to split by, e.g. Level')
+    parser.add_argument('--size', type=int, default=SHARD_SIZE, help='maximum number of cards per shard')
+    parser.add_argument('--remove', action='store_true', help='remove the shards, the deck is loaded whole again')
+    args = parser.parse_args()
+    if args.remove:
+        if os.path.exists(shard_dir(args.deckfile)):
+            shutil.rmtree(shard_dir(args.deckfile))
+        return
+    vocab = pd.read_excel(args.deckfile)
+    write_shards(args.deckfile, vocab, args.by, args.size)
+    manifest = _read_manifest(args.deckfile)
+    print('%d cards in %d shards' % (len(vocab), len(manifest['shards'])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# Benchmarks for the gmn data pipeline on synthetic datasets.
+# Run with: python -m gmn.benchmark
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from gmn.gmn import GmnModel
+from gmn.store import GraphStore
+
+# modules that must not be loaded before the gmn window is shown
+LAZY_MODULES = ['pandas', 'networkx', 'matplotlib', 'requests', 'bs4', 'PIL']
+
+
+# generate random nodes and edges in the format of assets/nodes.csv and assets/edges.csv
+def synthetic_data(n_nodes, n_edges, seed=0):
+    rng = np.random.default_rng(seed)
+    categories = np.array(['Olympian', 'Titan', 'Hero', 'Mortal', 'Creature'])
+    nodes = pd.DataFrame({'name': [f'node{i}' for i in range(n_nodes)],
+                          'category': categories[rng.integers(0, len(categories), n_nodes)],
+                          'enabled': True})
+    names = nodes['name'].to_numpy()
+    edges = pd.DataFrame({'node1': names[rng.integers(0, n_nodes, n_edges)],
+                          'node2': names[rng.integers(0, n_nodes, n_edges)],
+                          'category': np.where(rng.random(n_edges) < 0.3, 'partner', 'descendant'),
+                          'comment': ''})
+    return nodes, edges
+
+
+# time one call of func in seconds, best of repeat
+def best_of(func, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+# refresh time of the edge selection as the number of edges grows
+def bench_update_edges(sizes, n_nodes=5000, frac_shown=0.1):
+    print(f'{"edges":>10} {"store [ms]":>12} {"refresh [ms]":>14} {"selected":>10}')
+    for n_edges in sizes:
+        nodes, edges = synthetic_data(n_nodes, n_edges)
+        t_index = best_of(lambda: GraphStore(nodes, edges))
+        store = GraphStore(nodes, edges)
+        shown = np.flatnonzero(np.random.default_rng(0).random(store.n_nodes) < frac_shown)
+        t_refresh = best_of(lambda: edges[store.edge_mask(shown)])
+        n_selected = len(edges[store.edge_mask(shown)])
+        print(f'{n_edges:>10} {t_index * 1000:>12.2f} {t_refresh * 1000:>14.2f} {n_selected:>10}')
+
+
+# time from reading the csv files or the snapshot to a ready model, and of adding edges afterwards
+def bench_startup(sizes, n_nodes=5000, n_added=100):
+    added_label = f'add {n_added} [ms]'
+    print(f'{"edges":>10} {"csv [ms]":>12} {"snapshot [ms]":>14} {added_label:>14}')
+    for n_edges in sizes:
+        nodes, edges = synthetic_data(n_nodes, n_edges + n_added)
+        added = edges[n_edges:]
+        with tempfile.TemporaryDirectory() as dd:
+            nodes[['name', 'category']].to_csv(os.path.join(dd, 'nodes.csv'), index=False)
+            edges[:n_edges].to_csv(os.path.join(dd, 'edges.csv'), index=False)
+            # the first start parses the csv files and writes the snapshot
+            t_csv = best_of(lambda: GmnModel(layout='force', dd=dd), repeat=1)
+            t_snapshot = best_of(lambda: GmnModel(layout='force', dd=dd))
+            model = GmnModel(layout='force', dd=dd)
+            t_add = best_of(lambda: model.append_edges(added), repeat=1)
+        print(f'{n_edges:>10} {t_csv * 1000:>12.2f} {t_snapshot * 1000:>14.2f} {t_add * 1000:>14.2f}')
+
+
+# import time of a module in a fresh interpreter from python -X importtime,
+# returns the lazy modules that were imported anyway
+def bench_import(module='gmn.gmn', top=10):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times.append((int(cumulative), name.strip()))
+    loaded = {name for _, name in times}
+    total = dict((name, t) for t, name in times)[module]
+    print(f'import {module}: {total / 1000:.1f} ms')
+    for t, name in sorted(times, reverse=True)[1:top + 1]:
+        print(f'{t / 1000:>10.1f} ms  {name}')
+    return [name for name in LAZY_MODULES if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks for gmn.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000, 100000],
+                        help='number of synthetic edges')
+    args = parser.parse_args()
+    bench_update_edges(args.sizes)
+    print()
+    bench_startup(args.sizes)
+    print()
+    eager = bench_import()
+    if eager:
+        sys.exit(f'imported before the window is shown: {", ".join(eager)}')
+
+
+if __name__ == "__main__":
+    main()
@@ -6,50 +6,279 @@
 #
 # Distributed under terms of the MIT license.
 
-import networkx as nx
+# pandas, networkx, matplotlib and PIL are imported where they are first
+# needed, so that the window can be shown before they are loaded
+
+import argparse
 import numpy as np
 import os
-import pandas as pd
-import requests
 import sys
 import tkinter as tk
 import webbrowser
-import matplotlib.pyplot as plt
-from bs4 import BeautifulSoup
-from io import BytesIO
-from PIL import Image, ImageTk
-from tkinter import ttk
-from matplotlib.collections import PathCollection
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from urllib.request import urlopen, Request
-
-
-class Gmn:
-    def __init__(self, master):
-        self.master = master
-        master.title("GMN - Greek Mythology Network")
+from collections import Counter
+from tkinter import filedialog, ttk
+from gmn.images import ImageLoader
+from gmn.layout import LAYOUT_ENGINES, WARM_START, compute_layout, default_engine
+from gmn.layout_cache import LayoutCache
+from gmn.profiling import profiler, timed
+
+
+# draw nodes, edges and labels of a network into a matplotlib axis, returns
+# the node collection and dicts of the edge and label artists
+def plot_network(ax, network, pos):
+    import networkx as nx
+    nodes = nx.draw_networkx_nodes(network, pos, ax=ax, node_size=10, node_color='w')
+    edges = plot_edges(ax, network, pos, list(network.edges))
+    labels = nx.draw_networkx_labels(network, pos, font_weight='bold', ax=ax)
+    return nodes, edges, labels
+
+
+# draw some edges of a network, returns a dict of edge -> arrow
+def plot_edges(ax, network, pos, edgelist):
+    import networkx as nx
+    if not edgelist:
+        return {}
+    arrows = nx.draw_networkx_edges(network, pos, edgelist=edgelist,
+                                    arrowstyle='->', arrowsize=15,
+                                    min_source_margin=10, min_target_margin=10,
+                                    width=[network.edges[edge]['width'] for edge in edgelist],
+                                    edge_color=[network.edges[edge]['colour'] for edge in edgelist],
+                                    connectionstyle='arc3,rad=0.2', ax=ax)
+    return dict(zip(edgelist, arrows))
+
+
+# data and network of gmn without any gui, shared by the app and the headless renderer
+class GmnModel:
+    # share of new nodes above which an incremental update is laid out again
+    warm_start_fraction = 0.2
+
+    def __init__(self, incremental=True, layout=None, dd=None):
+        self.incremental = incremental
+        self.layout = layout or default_engine()
+
+        from gmn.journal import EdgeJournal
+        from gmn.snapshot import Snapshot
 
         # data paths
-        self.dd = os.path.join(os.path.dirname(__file__), 'assets')
-        self.nodes = pd.read_csv(os.path.join(self.dd, 'nodes.csv'))
-
-        self.edges_full = pd.read_csv(os.path.join(self.dd, 'edges.csv'))
-        self.add_columns()
+        self.dd = dd or os.path.join(os.path.dirname(__file__), 'assets')
+        self.journal = EdgeJournal(self.dd)
+        self.snapshot = Snapshot(self.dd)
+        self.layout_cache = LayoutCache(os.path.join(self.dd, 'layout_cache.json'))
+        self.load_data()
         self.website = 'https://www.greekmythology.com'
 
         # initialize attributes
         self.edges_selected = []
         self.network = []
         self.pos = []
+        self.edges_network = []
+        self.edge_count = Counter()
+
+    # read nodes and edges from the snapshot, or parse the csv files and write a new snapshot
+    @timed('load data')
+    def load_data(self):
+        import pandas as pd
+        data = self.snapshot.load()
+        if data is None:
+            self.nodes = pd.read_csv(os.path.join(self.dd, 'nodes.csv'))
+            self.edges_full = pd.read_csv(os.path.join(self.dd, 'edges.csv'))
+            self.add_columns()
+            self.snapshot.save(self.nodes, self.edges_full, self.store)
+        else:
+            self.nodes, self.edges_full, self.store = data
+            self.kinship = None
+        # edges entered in the gui since the last save are replayed from the journal
+        self.append_edges(self.journal.replay(len(self.edges_full)))
+        # the last layout is used if the same network is shown again
+        last = self.snapshot.load_layout()
+        if last is not None and last[0] not in self.layout_cache.entries:
+            self.layout_cache.put(*last)
+
+    # keep the current layout and the layout cache for the next start
+    def save_layout(self):
+        self.layout_cache.flush()
+        if self.network:
+            self.snapshot.save_layout(self.layout_cache.key(self.network.edges, self.layout), self.pos)
+
+    # add new columns to dataframes
+    def add_columns(self):
+        from gmn.store import GraphStore
+        #self.nodes['ID'] = 'not defined'
+        self.edges_full['width'] = np.where(self.edges_full.category == 'partner', 3, 3)
+        self.edges_full['colour'] = np.where(self.edges_full.category == 'partner', 'plum', 'lightgreen')
+        self.store = GraphStore(self.nodes, self.edges_full)
+        self.kinship = None
+        self.node_columns()
+
+    # degree and enabled flag of the nodes, the store keeps nodes.csv in the order of self.nodes
+    def node_columns(self):
+        self.nodes['degree'] = self.store.degree[:len(self.nodes)]
+        self.nodes['enabled'] = self.store.enabled[:len(self.nodes)]
+
+    # append new edges without rebuilding the derived columns of the existing ones
+    def append_edges(self, edges):
+        import pandas as pd
+        from gmn.importer import COLUMNS
+        if edges.empty:
+            return
+        edges = edges[COLUMNS].copy()
+        edges['width'] = np.where(edges.category == 'partner', 3, 3)
+        edges['colour'] = np.where(edges.category == 'partner', 'plum', 'lightgreen')
+        self.edges_full = pd.concat([self.edges_full, edges], ignore_index=True)
+        self.store.add_edges(edges)
+        self.kinship = None
+        self.node_columns()
+
+    # add validated edges from a csv, tsv or jsonl file, returns accepted and rejected rows
+    def import_edges(self, filename):
+        from gmn import importer
+        accepted, rejects = importer.import_edges(filename, self.store, self.edges_full)
+        if not accepted.empty:
+            self.journal.append_many(accepted.to_dict('records'))
+            self.append_edges(accepted)
+        return accepted, rejects
+
+    # index for lineage queries, built on first use
+    def kinship_index(self):
+        if self.kinship is None:
+            from gmn.query import KinshipIndex
+            self.kinship = KinshipIndex(self.store)
+        return self.kinship
+
+    # default settings for which nodes will be displayed
+    def default_selection_nodes(self):
+        self.store.show[:] = False
+        self.store.set_show(['Chaos', 'Rhea'])
+
+    # update edges based on selection in treeview
+    @timed('update edges')
+    def update_edges(self):
+        mask = self.store.edge_mask(np.flatnonzero(self.store.show))
+        self.edges_selected = self.edges_full[mask]
+
+    # generate network from selection of edges
+    def generate_network(self):
+        import networkx as nx
+        incremental = self.incremental and self.network
+        if incremental:
+            self.update_network()
+        else:
+            #self.network = nx.from_pandas_edgelist(self.edges_selected, 'node1', 'node2', edge_attr=True)
+            self.network = nx.from_pandas_edgelist(self.edges_selected, source='node1', target='node2', create_using = nx.DiGraph(), edge_attr=True)
+            #self.network = self.network.to_directed()
+            self.edge_count = Counter(zip(self.edges_selected['node1'], self.edges_selected['node2']))
+        self.edges_network = self.edges_selected
+        self.layout_network(incremental)
+
+    # compute positions of the nodes in the network
+    @timed('layout')
+    def layout_network(self, incremental):
+        # reuse the layout of a subgraph that has been shown before
+        key = self.layout_cache.key(self.network.edges, self.layout)
+        pos = self.layout_cache.get(key)
+        if pos is not None and all(node in pos for node in self.network):
+            self.pos = {node: pos[node] for node in self.network}
+            return
+        if incremental:
+            n_new = self.place_new_nodes()
+            # few new nodes are left where they were placed
+            if n_new <= self.warm_start_fraction * len(self.network):
+                return
+            # many new nodes, e.g. after select all, are laid out by the engine, starting
+            # from the placed positions if it supports warm starts
+            self.pos = compute_layout(self.network, self.layout, pos=self.pos if self.layout in WARM_START else None)
+        else:
+            # previous positions are used as warm start by engines that support it
+            self.pos = compute_layout(self.network, self.layout, pos=self.pos or None)
+        # only layouts of the engine are cached, placed nodes are not
+        self.layout_cache.put(key, self.pos)
+
+    # apply only the difference between the previous and the new selection of edges to the network
+    def update_network(self):
+        previous = self.edges_network
+        added = self.edges_selected.loc[self.edges_selected.index.difference(previous.index)]
+        removed = previous.loc[previous.index.difference(self.edges_selected.index)]
+        changed = set()
+        for edge in zip(removed['node1'], removed['node2']):
+            self.edge_count[edge] -= 1
+            if self.edge_count[edge] == 0:
+                del self.edge_count[edge]
+                self.network.remove_edge(*edge)
+                changed.update(edge)
+        for row in added.to_dict('records'):
+            edge = (row.pop('node1'), row.pop('node2'))
+            self.edge_count[edge] += 1
+            self.network.add_edge(*edge, **row)
+        self.network.remove_nodes_from([node for node in changed if self.network.degree(node) == 0])
+
+    # keep positions of unchanged nodes and put new nodes next to their neighbours,
+    # returns the number of new nodes
+    def place_new_nodes(self):
+        import networkx as nx
+        pos = {node: xy for node, xy in self.pos.items() if node in self.network}
+        new = [node for node in self.network if node not in pos]
+        n_new = len(new)
+        if pos:
+            xy = np.array(list(pos.values()))
+            low, high = xy.min(axis=0), xy.max(axis=0)
+        else:
+            low, high = np.zeros(2), np.ones(2)
+        spread = max((high - low).max(), 1) * 0.05
+        rng = np.random.default_rng(len(new))
+        while new:
+            remaining = []
+            for node in new:
+                neighbours = [pos[n] for n in nx.all_neighbors(self.network, node) if n in pos]
+                if neighbours:
+                    pos[node] = tuple(np.mean(neighbours, axis=0) + rng.normal(0, spread, 2))
+                else:
+                    remaining.append(node)
+            # nodes without placed neighbours start a new cluster at a random position
+            if len(remaining) == len(new):
+                node = remaining.pop(0)
+                pos[node] = tuple(rng.uniform(low, high))
+            new = remaining
+        self.pos = {node: pos[node] for node in self.network}
+        return n_new
+
+    # compose url from node name and category
+    def get_url(self, name=None):
+        if name is None:
+            name = self.name
+        category = self.store.category_of(name)
+        url = f'{self.website}/{category}s/{name}/{name}.html'
+        return url
+
+
+class Gmn(GmnModel):
+    # number of names of a query result that are listed
+    query_lines = 15
+
+    def __init__(self, master, incremental=True, layout=None, prefetch=False):
+        self.master = master
+        self.prefetch = prefetch
+        master.title("GMN - Greek Mythology Network")
+
+        # initialize attributes
+        self.ready = False
         self._im = []
         self._image = []
         self.name = []
+        # treeview items of nodes and the other way round
+        self.tree_items = {}
+        self.item_nodes = {}
+        # categories whose nodes have been inserted into the treeview
+        self.populated = set()
 
         # build frame_treeview
         self.frame_treeview = tk.Frame(self.master)
         self.frame_treeview.grid(row=0, column=0, sticky=tk.W)
 
+        self.search_v = tk.StringVar()
+        search = tk.Entry(self.frame_treeview, textvariable=self.search_v)
+        search.grid(row=0, column=0, sticky=tk.W + tk.E)
+        search.bind('<Return>', self.action_search)
+
         self.tree = ttk.Treeview(self.frame_treeview, height=25)
         self.tree.grid(row=1, column=0, sticky=tk.E)
 
@@ -73,6 +302,10 @@ class Gmn:
         # build frame_network
         self.frame_network = tk.Frame(self.master)
         self.frame_network.grid(row=0, column=1, rowspan=2)
+        # placeholder until the network has been laid out
+        self.progress_v = tk.StringVar()
+        self.progress = tk.Label(self.frame_network, textvariable=self.progress_v, width=80, height=40)
+        self.progress.grid()
 
         # build frame_info
         self.frame_info = tk.Frame(self.master)
@@ -99,34 +332,64 @@ class Gmn:
         tk.Button(self.frame_info, textvariable=self.info_btn_v, command=self.open_website).grid(row=6)
 
         tk.Button(self.frame_info, text='Enter new edges', command=self.add_edges).grid(row=7)
-
-        # start up app
+        tk.Button(self.frame_info, text='Import edges', command=self.action_click_import).grid(row=9)
+
+        # timings of the profiler, only shown when profiling is enabled
+        self.stats_v = tk.StringVar()
+        if profiler.enabled:
+            tk.Label(self.frame_info, textvariable=self.stats_v, justify=tk.LEFT).grid(row=10)
+            self.poll_stats()
+
+        # lineage queries, the widgets are added by init_query
+        self.frame_query = tk.Frame(self.frame_info)
+        self.frame_query.grid(row=8)
+
+        # data is loaded once the window is shown
+        self.set_progress('loading data...')
+        self.master.after(1, self.start_up, incremental, layout)
+
+    # load data, lay out and draw the network
+    def start_up(self, incremental, layout):
+        GmnModel.__init__(self, incremental=incremental, layout=layout)
+        self.images = ImageLoader(self.website, os.path.join(self.dd, 'images'))
+        self.init_query()
         self.default_selection_nodes()
         self.update_edges()
-        self.reset_info()
         self.create_treeview()
+        self.set_progress('laying out network...')
         self.generate_network()
+        self.progress.destroy()
+        self.init_canvas()
         self.draw_network()
-
-    # add new columns to dataframes
-    def add_columns(self):
-        self.nodes['enabled'] = [True if name in list(set(self.edges_full['node1'].tolist() + self.edges_full['node2'].tolist())) else False for name in self.nodes['name']]
-        self.nodes = self.nodes.sort_values(by=['enabled', 'name'], ascending=(False, True))
-        self.nodes['show'] = self.nodes['enabled']
-        #self.nodes['ID'] = 'not defined'
-        self.edges_full['width'] = np.where(self.edges_full.category == 'partner', 3, 3)
-        self.edges_full['colour'] = np.where(self.edges_full.category == 'partner', 'plum', 'lightgreen')
-
-    # default settings for which nodes will be displayed
-    def default_selection_nodes(self):
-        self.nodes['show'] = False
-        self.nodes.loc[self.nodes['name'].isin(['Chaos', 'Rhea']), 'show'] = True
+        self.reset_info()
+        self.poll_images()
+        self.ready = True
+
+    def set_progress(self, text):
+        self.progress_v.set(text)
+        self.master.update_idletasks()
+
+    # lineage queries: query type, name(s) separated by comma, optional depth
+    def init_query(self):
+        from gmn.query import QUERIES
+        self.query_v = tk.StringVar()
+        self.query_v.set(QUERIES[0])
+        tk.OptionMenu(self.frame_query, self.query_v, *QUERIES).grid(row=0, column=0)
+        self.query_names_v = tk.StringVar()
+        tk.Entry(self.frame_query, textvariable=self.query_names_v).grid(row=0, column=1)
+        self.query_depth_v = tk.StringVar()
+        tk.Entry(self.frame_query, textvariable=self.query_depth_v, width=3).grid(row=0, column=2)
+        tk.Button(self.frame_query, text='query', command=self.action_click_query).grid(row=0, column=3)
+        # result of the last query, e.g. the kinship path between two names
+        self.query_result_v = tk.StringVar()
+        tk.Label(self.frame_query, textvariable=self.query_result_v, justify=tk.LEFT).grid(row=1, columnspan=4)
 
     # callback buttons
     def action_click_expand_all(self):
         if self.btn_text.get() == 'expand all':
             self.btn_text.set('close all')
             for child in self.tree.get_children():
+                self.populate_category(child)
                 self.tree.item(child, open=True)
         else:
             self.btn_text.set('expand all')
@@ -134,20 +397,28 @@ class Gmn:
                 self.tree.item(child, open=False)
 
     def action_click_select_all(self):
-        self.nodes['show'] = self.nodes['enabled']
-        for ind, node in self.nodes[self.nodes['show'] == True].iterrows():
-            my_id = node['ID']
-            name = node['name']
-            if node['show']:
-                self.tree.item(my_id, text=f'X {name}')
-                self.nodes.loc[self.nodes.name == name, 'show'] = True
+        self.store.show[:] = self.store.enabled
+        for cat in list(self.populated):
+            self.label_category(cat)
 
     def action_click_deselect_all(self):
-        self.nodes['show'] = False
-        for child in self.tree.get_children():
-            for sub_child in self.tree.get_children(child):
-                name = self.tree.item(sub_child)['values'][0]
-                self.tree.item(sub_child, text=f'_ {name}')
+        self.store.show[:] = False
+        for cat in list(self.populated):
+            self.label_category(cat)
+
+    # select and reveal all nodes whose name starts with the search text
+    def action_search(self, event=None):
+        ids = self.store.prefix_search(self.search_v.get().strip())
+        if len(ids) == 0:
+            self.info_info_v.set('no matching name')
+            return
+        for cat in set(self.store.categories[c] for c in self.store.node_category[ids]):
+            self.populate_category(cat)
+            self.tree.item(cat, open=True)
+        items = [self.tree_items[i] for i in ids]
+        self.tree.selection_set(items)
+        self.tree.see(items[0])
+        self.info_info_v.set(f'{len(ids)} matching names')
 
     def action_click_refresh(self):
         self.update_edges()
@@ -160,38 +431,62 @@ class Gmn:
             self.info_info_v.set("Click on a name for info.")
             self.reset_info()
 
+    # select the result of a lineage query and show it
+    def action_click_query(self):
+        from gmn.query import run_query
+        names = [name.strip() for name in self.query_names_v.get().split(',') if name.strip()]
+        try:
+            depth = int(self.query_depth_v.get()) if self.query_depth_v.get().strip() else None
+            ids, text = run_query(self.kinship_index(), self.query_v.get(), names, depth)
+        except (KeyError, ValueError) as e:
+            self.query_result_v.set(str(e).strip("'"))
+            return
+        if len(ids) == 0:
+            # nothing found, the selection is kept
+            self.query_result_v.set(text or f'no results for {self.query_v.get()}')
+            return
+        self.store.show[:] = False
+        self.store.show[ids] = True
+        self.store.set_show(names)
+        for cat in list(self.populated):
+            self.label_category(cat)
+        self.action_click_refresh()
+        if self.query_v.get() == 'path':
+            self.query_result_v.set(text)
+        else:
+            # long lists of names are cut
+            lines = text.split('\n')
+            if len(lines) > self.query_lines:
+                lines = lines[:self.query_lines] + [f'... and {len(lines) - self.query_lines} more']
+            self.query_result_v.set('\n'.join([f'{len(ids)} results for {self.query_v.get()}:'] + lines))
+
     # callback for double click on label
     def action_double_click(self, event):
         my_id = self.tree.selection()[0]
-        self.name = self.tree.item(my_id)['values'][0]
-        if self.name in self.nodes.name.to_list():
-            node = self.nodes[self.nodes.ID == my_id]
-            if node['enabled'].values[0]:
-                if node['show'].values[0]:
+        if my_id in self.item_nodes:
+            i = self.item_nodes[my_id]
+            self.name = self.store.names[i]
+            if self.store.enabled[i]:
+                if self.store.show[i]:
                     self.tree.item(my_id, text=f'_ {self.name}')
-                    self.nodes.loc[self.nodes.name == self.name, 'show'] = False
+                    self.store.show[i] = False
                 else:
                     self.tree.item(my_id, text=f'X {self.name}')
-                    self.nodes.loc[self.nodes.name == self.name, 'show'] = True
+                    self.store.show[i] = True
             else:
                 self.info_info_v.set('no links entered')
                 self.update_info()
-        elif self.name in self.nodes.category.to_list():
-            subset = self.nodes[(self.nodes['category'] == self.name) & (self.nodes['enabled'] == True)]
-            if any([item == False for item in subset.show.to_list()]):
-                for ind, node in subset.iterrows():
-                    name = node['name']
-                    self.tree.item(node['ID'], text=f'X {name}')
-                    self.nodes.loc[self.nodes.name == name, 'show'] = True
-            elif all([item == True for item in subset.show.to_list()]):
-                for ind, node in subset.iterrows():
-                    name = node['name']
-                    self.tree.item(node['ID'], text=f'_ {name}')
-                    self.nodes.loc[self.nodes.name == name, 'show'] = False
+        elif my_id in self.store.category_ids:
+            self.name = my_id
+            subset = self.store.category_members(my_id)
+            subset = subset[self.store.enabled[subset]]
+            self.store.show[subset] = not self.store.show[subset].all()
+            self.label_category(my_id)
 
     # clear info frame
     def reset_info(self):
         self.name = []
+        self.highlight_node(None)
         self.info_name_v.set("")
         self.img_label.configure(image=[])
         self.info_credit_v.set("")
@@ -199,7 +494,7 @@ class Gmn:
 
     # populate info frame
     def update_info(self):
-        if self.name in self.nodes.name.to_list():
+        if self.store.category_of(self.name) is not None:
             self.info_info_v.set("")
             self.info_name_v.set(self.name)
             try:
@@ -212,74 +507,174 @@ class Gmn:
             self.info_info_v.set('name not in nodes list')
             self.reset_info()
 
-    # compose url from node name and category
-    def get_url(self):
-        category = self.nodes[self.nodes.name == self.name].category.values[0]
-        url = f'{self.website}/{category}s/{self.name}/{self.name}.html'
-        return url
-
     # callback to click on node in network
     def action_click_name(self, event):
+        from matplotlib.collections import PathCollection
         if isinstance(event.artist, PathCollection):
             ind = event.ind[0]
             name = list(self.pos.keys())[ind]
             self.name = name
+            self.highlight_node(name)
             self.update_info()
 
-    # generate network from selection of edges
+    # generate network and start loading images in the background
     def generate_network(self):
-        #self.network = nx.from_pandas_edgelist(self.edges_selected, 'node1', 'node2', edge_attr=True)
-        self.network = nx.from_pandas_edgelist(self.edges_selected, source='node1', target='node2', create_using = nx.DiGraph(), edge_attr=True)
-        #self.network = self.network.to_directed()
-        #self.pos = nx.layout.spring_layout(self.network)
-        self.pos = nx.nx_agraph.graphviz_layout(self.network)
-
-    # draw network
+        GmnModel.generate_network(self)
+        if self.prefetch:
+            self.prefetch_images()
+
+    # load images of all nodes in the network in the background
+    def prefetch_images(self):
+        self.images.prefetch([(name, self.get_url(name)) for name in self.network
+                              if self.store.category_of(name) is not None])
+
+    # figure and canvas are created once and reused for every redraw
+    def init_canvas(self):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        self.fig = Figure(figsize=(8, 8))
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=self.frame_network)
+        self.canvas.get_tk_widget().grid()
+        self.canvas.mpl_connect('pick_event', self.action_click_name)
+        self.canvas.mpl_connect('draw_event', self.cache_background)
+        self.highlight = None
+        self._background = None
+        # network, positions and edge styles of the artists on the canvas
+        self._drawn = None
+        self._drawn_pos = {}
+        self._drawn_styles = {}
+
+    # draw network, artists are only rebuilt when the layout changed
+    @timed('draw')
     def draw_network(self):
-        plt.close("all")
-        for widget in self.frame_network.winfo_children():
-            widget.destroy()
-        fig = Figure(figsize=(8, 8))
-        ax = fig.add_subplot(111)
-        nodes = nx.draw_networkx_nodes(self.network, self.pos, ax=ax, node_size=10, node_color='w')
-        nodes.set_picker(5)
-        nx.draw_networkx_edges(self.network, self.pos,
-                               arrowstyle='->', arrowsize=15,
-                               min_source_margin=10, min_target_margin=10,
-                               width=list(nx.get_edge_attributes(self.network, 'width').values()),
-                               edge_color=nx.get_edge_attributes(self.network, 'colour').values(),
-                               connectionstyle='arc3,rad=0.2', ax=ax)
-        nx.draw_networkx_labels(self.network, self.pos, font_weight='bold', ax=ax)
-        canvas = FigureCanvasTkAgg(fig, master=self.frame_network)
-        canvas.draw()
-
-        canvas.get_tk_widget().grid()
-        fig.canvas.mpl_connect('pick_event', self.action_click_name)
-
-    # generate treeview based on info in nodes and edges
+        drawn = (tuple(self.network.edges), tuple(self.pos.items()))
+        if drawn == self._drawn:
+            self.blit_highlight()
+            return
+        if self._drawn is None or not self.update_artists():
+            self.ax.clear()
+            self.node_artist, self.edge_artists, self.label_artists = plot_network(self.ax, self.network, self.pos)
+            self.node_artist.set_picker(5)
+            # marker of the clicked node, drawn on top of the cached background
+            self.highlight = self.ax.scatter([], [], s=300, facecolors='none', edgecolors='gold',
+                                             linewidths=3, animated=True)
+        self._drawn = drawn
+        self._drawn_pos = dict(self.pos)
+        self._drawn_styles = self.edge_styles()
+        self.canvas.draw()
+
+    def edge_styles(self):
+        return {(node1, node2): (data['width'], data['colour']) for node1, node2, data in self.network.edges(data=True)}
+
+    # Update the drawn artists to the current network if the nodes that are
+    # still shown did not move: new nodes, labels and edges are added and the
+    # ones that are gone are removed. Returns False if the layout changed and
+    # the network has to be drawn again.
+    def update_artists(self):
+        import networkx as nx
+        if any(self._drawn_pos[node] != xy for node, xy in self.pos.items() if node in self._drawn_pos):
+            return False
+        # the order of the nodes is the order of self.pos, which is used for picking
+        xy = np.array(list(self.pos.values()), dtype=float)
+        self.node_artist.set_offsets(xy)
+        for node in [node for node in self.label_artists if node not in self.pos]:
+            self.label_artists.pop(node).remove()
+        new = [node for node in self.pos if node not in self.label_artists]
+        self.label_artists.update(nx.draw_networkx_labels(self.network, self.pos, labels={node: node for node in new},
+                                                          font_weight='bold', ax=self.ax))
+        # edges that are gone or changed colour or width are removed, new and changed edges are drawn
+        styles = self.edge_styles()
+        for edge in [edge for edge in self.edge_artists if styles.get(edge) != self._drawn_styles[edge]]:
+            self.edge_artists.pop(edge).remove()
+        self.edge_artists.update(plot_edges(self.ax, self.network, self.pos,
+                                            [edge for edge in styles if edge not in self.edge_artists]))
+        # fit the axis to the nodes with the margin of networkx
+        low, high = xy.min(axis=0), xy.max(axis=0)
+        pad = 0.05 * (high - low)
+        self.ax.ignore_existing_data_limits = True
+        self.ax.update_datalim([low - pad, high + pad])
+        self.ax.autoscale_view()
+        return True
+
+    # keep a copy of the rendered network to blit the highlight onto
+    def cache_background(self, event):
+        self._background = self.canvas.copy_from_bbox(self.ax.bbox)
+        self.blit_highlight()
+
+    def blit_highlight(self):
+        if self._background is None or self.highlight is None:
+            return
+        self.canvas.restore_region(self._background)
+        self.ax.draw_artist(self.highlight)
+        self.canvas.blit(self.ax.bbox)
+
+    # mark a node in the network without redrawing it
+    def highlight_node(self, name):
+        if self.highlight is None:
+            return
+        if name is not None and name in self.pos:
+            self.highlight.set_offsets([self.pos[name]])
+        else:
+            self.highlight.set_offsets(np.empty((0, 2)))
+        self.blit_highlight()
+
+    # generate treeview based on info in nodes and edges, nodes are only inserted once a category is opened
     def create_treeview(self):
-        for cat, subset in self.nodes.groupby('category'):
+        self.tree_items = {}
+        self.item_nodes = {}
+        self.populated = set()
+        for cat in self.store.categories:
             self.tree.insert('', 'end', cat, values=cat, text=cat)
-            for ind, node in subset.iterrows():
-                node_name = str(node['name'])
-                my_id = self.tree.insert(cat, 'end', values=node_name, tag=node['enabled'])
-                self.nodes.at[ind, 'ID'] = my_id
-                if node['show']:
-                    self.tree.item(my_id, text=f'X {node_name}')
-                else:
-                    self.tree.item(my_id, text=f'_ {node_name}')
-        self.tree.tag_configure(False, foreground='grey')
+            # placeholder, so that the category can be opened
+            self.tree.insert(cat, 'end', text='...')
+        self.tree.tag_configure('disabled', foreground='grey')
         self.tree.bind("<Double-1>", self.action_double_click)
-        self.tree.item('Olympian', open=True)
-
-    # update edges based on selection in treeview
-    def update_edges(self):
-        ind_include = np.array([])
-        for ind, row in self.edges_full.iterrows():
-            if row['node1'] in self.nodes[self.nodes.show == True].name.tolist() \
-                    or row['node2'] in self.nodes[self.nodes.show == True].name.tolist():
-                ind_include = np.append(ind_include, ind)
-        self.edges_selected = self.edges_full.iloc[ind_include]
+        self.tree.bind('<<TreeviewOpen>>', self.action_open_category)
+        if 'Olympian' in self.store.category_ids:
+            self.populate_category('Olympian')
+            self.tree.item('Olympian', open=True)
+
+    def action_open_category(self, event):
+        cat = self.tree.focus()
+        if cat in self.store.category_ids:
+            self.populate_category(cat)
+
+    # insert the nodes of a category into the treeview
+    def populate_category(self, cat):
+        if cat in self.populated:
+            return
+        self.tree.delete(*self.tree.get_children(cat))
+        for i in self.store.category_members(cat):
+            node_name = str(self.store.names[i])
+            mark = 'X' if self.store.show[i] else '_'
+            tag = () if self.store.enabled[i] else ('disabled',)
+            my_id = self.tree.insert(cat, 'end', values=node_name, text=f'{mark} {node_name}', tag=tag)
+            self.tree_items[i] = my_id
+            self.item_nodes[my_id] = i
+        self.populated.add(cat)
+
+    # remove the nodes of a category from the treeview, they are inserted again when it is opened
+    def clear_category(self, cat):
+        items = self.tree.get_children(cat)
+        for item in items:
+            del self.tree_items[self.item_nodes.pop(item)]
+        self.tree.delete(*items)
+        self.tree.insert(cat, 'end', text='...')
+        self.populated.discard(cat)
+
+    # update de/selection marks of a category: open categories are relabelled,
+    # closed ones are cleared in one call instead of touching every item
+    def label_category(self, cat):
+        if cat not in self.populated:
+            return
+        if not self.tree.item(cat, 'open'):
+            self.clear_category(cat)
+            return
+        for item in self.tree.get_children(cat):
+            i = self.item_nodes[item]
+            mark = 'X' if self.store.show[i] else '_'
+            self.tree.item(item, text=f'{mark} {self.store.names[i]}')
 
     # open mythology website
     def open_website(self):
@@ -290,38 +685,40 @@ class Gmn:
             print(url)
             self.info_info_v.set('could not open url')
 
-    # scrap image from website
-    def get_tk_img(self):
-        url = self.get_url()
-        page = requests.get(url).text
-        soup = BeautifulSoup(page, 'html.parser')
-        for element in soup.find_all("img"):
-            sub_url = element.get('data-src')
-            if sub_url:
-                if '/images/mythology' in sub_url:
-                    req = Request(url=f'{self.website}{sub_url}', headers={'User-Agent': 'Mozilla/5.0'})
-                    u = urlopen(req)
-                    a = u.read()
-                    u.close()
-                    im = Image.open(BytesIO(a))
-                    return im
+    # request image, it is placed by poll_images once it has been loaded
+    def show_img(self):
+        img = self.images.request(self.name, self.get_url())
+        if img is None:
+            self.info_credit_v.set('loading image...')
+        else:
+            self.place_img(img)
 
     # place image in frame
-    def show_img(self):
-        img = self.get_tk_img()
-        basewidth = 300
-        wpercent = (basewidth / float(img.size[0]))
-        hsize = int((float(img.size[1]) * float(wpercent)))
-        self._im = img.resize((basewidth, hsize), Image.ANTIALIAS)
+    def place_img(self, img):
+        from PIL import ImageTk
+        self._im = img
         self._image = ImageTk.PhotoImage(self._im)
         self.img_label.configure(image=self._image)
         self.info_credit_v.set(f'Source: {self.website}')
-        # self._image = []
-        # self.info_credit_v.set("no image found")
+
+    def poll_stats(self):
+        self.stats_v.set(profiler.text())
+        self.master.after(1000, self.poll_stats)
+
+    # check for loaded images without blocking the main loop
+    def poll_images(self):
+        for name, img, error in self.images.poll():
+            if name != self.name:
+                continue
+            if error is None:
+                self.place_img(img)
+            else:
+                self.info_info_v.set('Cannot load image')
+                self.reset_info()
+        self.master.after(100, self.poll_images)
 
     def add_edges(self):
-        self.edges_full = EdgeEntry(self).return_df()
-        self.add_columns()
+        self.append_edges(EdgeEntry(self).return_df())
         self.default_selection_nodes()
         self.update_edges()
         self.reset_info()
@@ -330,6 +727,30 @@ class Gmn:
         self.generate_network()
         self.draw_network()
 
+    # bulk import of edges, rejected rows are written next to the imported file
+    def action_click_import(self):
+        filename = filedialog.askopenfilename(filetypes=[('edges', '*.csv *.tsv *.jsonl'), ('all files', '*')])
+        if not filename:
+            return
+        try:
+            accepted, rejects = self.import_edges(filename)
+        except (OSError, ValueError) as e:
+            self.info_info_v.set(f'import failed: {e}')
+            return
+        message = f'{len(accepted)} edges imported, {len(rejects)} rejected'
+        if not rejects.empty:
+            rejects_file = f'{os.path.splitext(filename)[0]}.rejects.csv'
+            rejects.to_csv(rejects_file, index=False)
+            message += f'\nsee {os.path.basename(rejects_file)}'
+        if not accepted.empty:
+            self.update_edges()
+            self.reset_info()
+            self.tree.delete(*self.tree.get_children())
+            self.create_treeview()
+            self.generate_network()
+            self.draw_network()
+        self.info_info_v.set(message)
+
 
 class EdgeEntry:
     def __init__(self, parent):
@@ -338,7 +759,8 @@ class EdgeEntry:
         self.dd = parent.dd
         self.column_headers = ['node1', 'node2', 'category', 'comment']
         self.nodes = parent.nodes
-        self.edges_full = parent.edges_full[self.column_headers]
+        self.journal = parent.journal
+        self.new_rows = []
         # set up fields
         self.dict_fields = {}
         for ind, field in enumerate(self.column_headers):
@@ -350,26 +772,48 @@ class EdgeEntry:
         tk.Button(self.master, text='Safe to file', command=self.save).grid(row=2, column=1)
         tk.Button(self.master, text='Done', command=self.close).grid(row=2, column=2)
 
+    # every entry is written to the journal right away
     def add_entry(self):
-        self.edges_full.loc[len(self.edges_full)] = [field.get() for field in self.dict_fields.values()]
+        row = {header: field.get() for header, field in self.dict_fields.items()}
+        self.journal.append(row)
+        self.new_rows.append(row)
         for field in self.dict_fields.values():
             field.set("")
 
+    # merge the journal into edges.csv in the background
     def save(self):
-        self.edges_full[self.column_headers].to_csv(os.path.join(self.dd, 'edges.csv'), index=False)
+        self.journal.compact_async()
 
     def close(self):
         self.master.destroy()
 
+    # edges entered in this window
     def return_df(self):
+        import pandas as pd
         self.master.wait_window()
-        return self.edges_full
+        return pd.DataFrame(self.new_rows, columns=self.column_headers)
 
 
 def main():
+    parser = argparse.ArgumentParser(description='A network visualization of the relationships in Greek mythology.')
+    parser.add_argument('--layout', choices=sorted(LAYOUT_ENGINES), default=None,
+                        help='layout engine, graphviz if pygraphviz is installed, otherwise force')
+    parser.add_argument('--prefetch', action='store_true',
+                        help='load the images of all shown nodes in the background')
+    parser.add_argument('--profile', nargs='?', const='gmn_profile.json', default=None, metavar='FILE',
+                        help='write timings to FILE on exit, cProfile stats if FILE ends in .prof')
+    args = parser.parse_args()
+    if args.profile:
+        profiler.enable(args.profile)
     root = tk.Tk()
-    Gmn(root)
+    app = Gmn(root, layout=args.layout, prefetch=args.prefetch)
     root.mainloop()
+    # the window can be closed before start up has finished
+    if app.ready:
+        app.images.close()
+        app.save_layout()
+        app.journal.compact()
+    profiler.dump()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,147 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# requests, BeautifulSoup and PIL are imported by the workers on first use
+
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import quote
+from urllib.request import urlopen, Request
+from gmn.profiling import timed
+
+# seconds to wait for a server, workers of the thread pool are joined at exit,
+# a stalled download would keep the program from closing
+TIMEOUT = 10
+
+
+# scrap image from website
+def download_img(url, website, timeout=TIMEOUT):
+    import requests
+    from bs4 import BeautifulSoup
+    from PIL import Image
+    page = requests.get(url, timeout=timeout).text
+    soup = BeautifulSoup(page, 'html.parser')
+    for element in soup.find_all("img"):
+        sub_url = element.get('data-src')
+        if sub_url:
+            if '/images/mythology' in sub_url:
+                req = Request(url=f'{website}{sub_url}', headers={'User-Agent': 'Mozilla/5.0'})
+                u = urlopen(req, timeout=timeout)
+                a = u.read()
+                u.close()
+                return Image.open(BytesIO(a))
+    raise ValueError(f'no image found on {url}')
+
+
+# scale image to a fixed width
+def resize_img(img, basewidth=300):
+    from PIL import Image
+    wpercent = (basewidth / float(img.size[0]))
+    hsize = int((float(img.size[1]) * float(wpercent)))
+    return img.resize((basewidth, hsize), Image.LANCZOS)
+
+
+# Fetches images on a thread pool. Resized images are kept in an in-memory
+# LRU cache and as png files in cache_dir. Finished downloads are collected
+# with poll(), which is meant to be called from the Tk main loop.
+class ImageLoader:
+    def __init__(self, website, cache_dir=None, basewidth=300, max_memory=64, workers=4):
+        self.website = website
+        self.cache_dir = cache_dir
+        self.basewidth = basewidth
+        self.max_memory = max_memory
+        self.memory = OrderedDict()
+        self.pending = {}
+        self.results = queue.Queue()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def cache_file(self, name):
+        return os.path.join(self.cache_dir, f'{quote(name, safe="")}.png')
+
+    # image from memory or None, mark entry as recently used
+    def cached(self, name):
+        with self.lock:
+            if name in self.memory:
+                self.memory.move_to_end(name)
+                return self.memory[name]
+        return None
+
+    def remember(self, name, img):
+        with self.lock:
+            self.memory[name] = img
+            self.memory.move_to_end(name)
+            while len(self.memory) > self.max_memory:
+                self.memory.popitem(last=False)
+
+    # worker: read image from disk cache or download it
+    @timed('image fetch')
+    def fetch(self, name, url):
+        if self.cache_dir is not None and os.path.exists(self.cache_file(name)):
+            from PIL import Image
+            img = Image.open(self.cache_file(name))
+            img.load()
+        else:
+            img = resize_img(download_img(url, self.website), self.basewidth)
+            if img.mode not in ('RGB', 'RGBA', 'L', 'P'):
+                img = img.convert('RGB')
+            if self.cache_dir is not None:
+                try:
+                    os.makedirs(self.cache_dir, exist_ok=True)
+                    img.save(self.cache_file(name))
+                except OSError:
+                    pass
+        self.remember(name, img)
+        return img
+
+    def done(self, name, future):
+        with self.lock:
+            self.pending.pop(name, None)
+        if future.cancelled():
+            return
+        error = future.exception()
+        self.results.put((name, None if error else future.result(), error))
+
+    # return the image if it is in memory, otherwise start fetching it and return None
+    def request(self, name, url):
+        img = self.cached(name)
+        if img is not None:
+            return img
+        with self.lock:
+            if name in self.pending:
+                return None
+            future = self.executor.submit(self.fetch, name, url)
+            self.pending[name] = future
+        future.add_done_callback(lambda f: self.done(name, f))
+        return None
+
+    # warm the cache for a list of (name, url) in the background
+    def prefetch(self, items):
+        for name, url in items:
+            self.request(name, url)
+
+    # all (name, image, error) that finished since the last call
+    def poll(self):
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    # cancel outstanding downloads
+    def close(self):
+        with self.lock:
+            futures = list(self.pending.values())
+        for future in futures:
+            future.cancel()
+        self.executor.shutdown(wait=False)
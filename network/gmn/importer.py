@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+import os
+import pandas as pd
+
+COLUMNS = ['node1', 'node2', 'category', 'comment']
+
+
+# read a csv, tsv or jsonl file of edges in chunks of rows
+def read_chunks(filename, chunksize=10000):
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return pd.read_json(filename, lines=True, dtype=False, chunksize=chunksize)
+    sep = '\t' if ext in ('.tsv', '.tab') else ','
+    return pd.read_csv(filename, sep=sep, dtype=str, keep_default_na=False, chunksize=chunksize)
+
+
+# Validate new edges against the node names in the store and deduplicate them
+# against the existing (node1, node2, category) triples and each other.
+# Returns the accepted edges and the rejected rows with a reason.
+def import_edges(filename, store, edges, chunksize=10000):
+    listed = pd.Index(store.names[store.node_category >= 0])
+    categories = set(store.edge_categories)
+    seen = set(zip(edges['node1'], edges['node2'], edges['category']))
+    accepted = []
+    rejects = []
+    line = 0
+    for chunk in read_chunks(filename, chunksize):
+        missing = [column for column in COLUMNS[:3] if column not in chunk.columns]
+        if missing:
+            raise ValueError(f'{filename} has no column {", ".join(missing)}')
+        chunk = chunk.reindex(columns=COLUMNS).fillna('')
+        for column in COLUMNS:
+            chunk[column] = chunk[column].astype(str).str.strip()
+        known1 = listed.get_indexer(chunk['node1']) >= 0
+        known2 = listed.get_indexer(chunk['node2']) >= 0
+        rows = zip(chunk['node1'], chunk['node2'], chunk['category'], chunk['comment'], known1, known2)
+        for node1, node2, category, comment, ok1, ok2 in rows:
+            line += 1
+            if not ok1:
+                reason = f'unknown node {node1}'
+            elif not ok2:
+                reason = f'unknown node {node2}'
+            elif category not in categories:
+                reason = f'unknown category {category}'
+            elif (node1, node2, category) in seen:
+                reason = 'duplicate'
+            else:
+                seen.add((node1, node2, category))
+                accepted.append((node1, node2, category, comment))
+                continue
+            rejects.append((line, node1, node2, category, comment, reason))
+    return (pd.DataFrame(accepted, columns=COLUMNS),
+            pd.DataFrame(rejects, columns=['line'] + COLUMNS + ['reason']))
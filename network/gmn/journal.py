@@ -0,0 +1,100 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+import json
+import os
+import threading
+import pandas as pd
+
+
+# Append-only journal of new edges next to edges.csv. Every edge is written as
+# one json line and synced to disk. The first line stores how many rows
+# edges.csv had when the journal was started, so that a crash between
+# rewriting edges.csv and removing the journal cannot duplicate edges.
+class EdgeJournal:
+    columns = ['node1', 'node2', 'category', 'comment']
+
+    def __init__(self, dd):
+        self.csv_file = os.path.join(dd, 'edges.csv')
+        self.filename = os.path.join(dd, 'edges.journal')
+        self.lock = threading.Lock()
+        self.thread = None
+        self.n_csv = 0
+
+    # rows of the journal that are not yet part of an edges.csv with n_csv rows
+    def pending(self, n_csv):
+        if not os.path.exists(self.filename):
+            return []
+        base = None
+        rows = []
+        with open(self.filename, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # last line cut off by a crash
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                if 'base' in entry:
+                    if base is None:
+                        base = entry['base']
+                elif all(column in entry for column in self.columns):
+                    rows.append(entry)
+        if base is None:
+            # no header, the journal was cut off right after it was created
+            base = n_csv
+        return rows[max(n_csv - base, 0):]
+
+    # edges in the journal that are missing from an edges.csv with n_csv rows
+    def replay(self, n_csv):
+        self.n_csv = n_csv
+        return pd.DataFrame(self.pending(n_csv), columns=self.columns)
+
+    def append(self, row):
+        self.append_many([row])
+
+    # write rows to the journal with a single fsync
+    def append_many(self, rows):
+        with self.lock:
+            with open(self.filename, 'a+', encoding='utf-8') as f:
+                # also an empty journal left behind by a crash gets a header
+                if f.tell() == 0:
+                    f.write(json.dumps({'base': self.n_csv}) + '\n')
+                elif f.tell() > 0:
+                    # start on a new line if the last write was cut off
+                    f.seek(f.tell() - 1)
+                    if f.read(1) != '\n':
+                        f.write('\n')
+                for row in rows:
+                    f.write(json.dumps({column: row[column] for column in self.columns}) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    # merge the journal into edges.csv and remove it
+    def compact(self):
+        with self.lock:
+            if not os.path.exists(self.filename):
+                return
+            edges = pd.read_csv(self.csv_file)
+            rows = self.pending(len(edges))
+            if rows:
+                edges = pd.concat([edges, pd.DataFrame(rows, columns=self.columns)], ignore_index=True)
+                tmp = f'{self.csv_file}.tmp'
+                with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                    edges[self.columns].to_csv(f, index=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp, self.csv_file)
+            self.n_csv = len(edges)
+            os.remove(self.filename)
+
+    # compact in a background thread, the lock keeps it from racing with appends
+    def compact_async(self):
+        self.thread = threading.Thread(target=self.compact)
+        self.thread.start()
@@ -0,0 +1,164 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# Layout engines for gmn. Every engine takes a network and optional
+# previous positions and returns a dict of node -> (x, y).
+
+import importlib.util
+import numpy as np
+
+
+# graphviz 'neato' layout, needs pygraphviz and the graphviz binaries
+def graphviz_layout(network, pos=None):
+    import networkx as nx
+    return nx.nx_agraph.graphviz_layout(network)
+
+
+# networkx spring layout
+def spring_layout(network, pos=None, iterations=50, seed=0):
+    import networkx as nx
+    if pos:
+        pos = {node: xy for node, xy in pos.items() if node in network}
+    layout = nx.spring_layout(network, pos=pos or None, iterations=iterations, seed=seed)
+    return {node: tuple(xy) for node, xy in layout.items()}
+
+
+# initial positions: previous positions where known, new nodes next to their neighbours
+def initial_positions(network, nodes, pos, rng):
+    x = rng.random((len(nodes), 2))
+    known = np.array([node in pos for node in nodes], dtype=bool) if pos else np.zeros(len(nodes), dtype=bool)
+    if not known.any():
+        return x, 1.0
+    x[known] = [pos[node] for node, k in zip(nodes, known) if k]
+    low, high = x[known].min(axis=0), x[known].max(axis=0)
+    extent = max((high - low).max(), 1e-9)
+    x[~known] = low + x[~known] * (high - low)
+    import networkx as nx
+    index = {node: i for i, node in enumerate(nodes)}
+    for i in np.flatnonzero(~known):
+        neighbours = [index[n] for n in nx.all_neighbors(network, nodes[i]) if known[index[n]]]
+        if neighbours:
+            x[i] = x[neighbours].mean(axis=0) + rng.normal(0, 0.05 * extent, 2)
+    return x, extent
+
+
+# sum of k^2 * (a_i - b_j) / |a_i - b_j|^2 over j, weighted by mass_j
+def pair_repulsion(a, b, k, mass=None):
+    dx = a[:, None, 0] - b[None, :, 0]
+    dy = a[:, None, 1] - b[None, :, 1]
+    weight = 1 / np.maximum(dx ** 2 + dy ** 2, 1e-9 * k ** 2)
+    if mass is not None:
+        weight *= mass
+    return k ** 2 * np.stack([(dx * weight).sum(axis=1), (dy * weight).sum(axis=1)], axis=1)
+
+
+# exact repulsion k^2 / d between all pairs of nodes
+def repulsion_exact(x, k):
+    return pair_repulsion(x, x, k)
+
+
+# Barnes-Hut style repulsion on a uniform grid: exact between nodes in neighbouring
+# cells, far cells interact through their centre of mass
+def repulsion_grid(x, k, nodes_per_cell=8):
+    n = len(x)
+    n_side = max(int(np.sqrt(n / nodes_per_cell)), 1)
+    # outliers are clipped into the border cells so that they do not stretch the grid
+    low, high = np.percentile(x, [1, 99], axis=0)
+    size = np.maximum(high - low, 1e-9) / n_side
+    cxy = np.clip(((x - low) / size).astype(int), 0, n_side - 1)
+    cell = cxy[:, 0] * n_side + cxy[:, 1]
+    n_cells = n_side ** 2
+    mass = np.bincount(cell, minlength=n_cells).astype(float)
+    centre = np.stack([np.bincount(cell, weights=x[:, d], minlength=n_cells) for d in range(2)], axis=1)
+    occupied = np.flatnonzero(mass)
+    centre[occupied] /= mass[occupied, None]
+
+    # far field between centres of mass of all cells that are not neighbours
+    occ_xy = np.stack([occupied // n_side, occupied % n_side], axis=1)
+    far = np.abs(occ_xy[:, None, :] - occ_xy[None, :, :]).max(axis=-1) > 1
+    cell_force = np.zeros((n_cells, 2))
+    cell_force[occupied] = pair_repulsion(centre[occupied], centre[occupied], k, far * mass[occupied])
+    force = cell_force[cell]
+
+    # near field between all pairs of nodes in the same or adjacent cells
+    order = np.argsort(cell, kind='stable')
+    start = np.concatenate([[0], np.cumsum(mass.astype(int))])
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            nxy = cxy + (dx, dy)
+            valid = ((nxy >= 0) & (nxy < n_side)).all(axis=1)
+            i = np.flatnonzero(valid)
+            ncell = nxy[i, 0] * n_side + nxy[i, 1]
+            counts = mass[ncell].astype(int)
+            i = np.repeat(i, counts)
+            offset = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+            j = order[np.repeat(start[ncell], counts) + offset]
+            keep = i != j
+            i, j = i[keep], j[keep]
+            delta = x[i] - x[j]
+            dist2 = np.maximum((delta ** 2).sum(axis=-1), 1e-9 * k ** 2)
+            pair = k ** 2 * delta / dist2[:, None]
+            force += np.stack([np.bincount(i, weights=pair[:, d], minlength=n) for d in range(2)], axis=1)
+    return force
+
+
+# vectorized Fruchterman-Reingold layout with a fixed iteration budget
+def force_layout(network, pos=None, iterations=100, exact_below=1000, seed=0):
+    nodes = list(network)
+    n = len(nodes)
+    if n == 0:
+        return {}
+    rng = np.random.default_rng(seed)
+    x, extent = initial_positions(network, nodes, pos, rng)
+    if n == 1:
+        return {nodes[0]: tuple(x[0])}
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array([(index[u], index[v]) for u, v in network.edges() if u != v], dtype=int).reshape(-1, 2)
+    k = extent / np.sqrt(n)
+    # warm starts only need to relax the layout, cold starts need to untangle it
+    temperature = (0.02 if pos else 0.1) * extent
+    cooling = temperature / iterations
+    for _ in range(iterations):
+        if n < exact_below:
+            disp = repulsion_exact(x, k)
+        else:
+            disp = repulsion_grid(x, k)
+        delta = x[edges[:, 0]] - x[edges[:, 1]]
+        attraction = delta * np.sqrt((delta ** 2).sum(axis=-1))[:, None] / k
+        for d in range(2):
+            disp[:, d] -= np.bincount(edges[:, 0], weights=attraction[:, d], minlength=n)
+            disp[:, d] += np.bincount(edges[:, 1], weights=attraction[:, d], minlength=n)
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=-1)), 1e-9)
+        x += disp / length[:, None] * np.minimum(length, temperature)[:, None]
+        temperature -= cooling
+    return {node: tuple(xy) for node, xy in zip(nodes, x)}
+
+
+LAYOUT_ENGINES = {
+    'graphviz': graphviz_layout,
+    'spring': spring_layout,
+    'force': force_layout,
+}
+
+# engines that start from previous positions, graphviz always starts from scratch
+WARM_START = ['spring', 'force']
+
+
+# graphviz if pygraphviz is installed, otherwise the numpy force layout
+def default_engine():
+    if importlib.util.find_spec('pygraphviz') is not None:
+        return 'graphviz'
+    return 'force'
+
+
+def compute_layout(network, engine=None, pos=None):
+    if engine is None:
+        engine = default_engine()
+    if engine not in LAYOUT_ENGINES:
+        raise ValueError(f'unknown layout engine {engine}, choose from {sorted(LAYOUT_ENGINES)}')
+    return LAYOUT_ENGINES[engine](network, pos=pos)
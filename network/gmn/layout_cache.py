@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+
+# least recently used cache of node positions, keyed by the edges of a network
+class LayoutCache:
+    def __init__(self, filename=None, max_entries=100):
+        self.filename = filename
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # entries that are not written to the file yet
+        self.dirty = False
+        self.load()
+
+    # hash of the layout engine and the sorted edge set
+    @staticmethod
+    def key(edges, engine=''):
+        h = hashlib.sha1(f'{engine}\n'.encode('utf-8'))
+        for node1, node2 in sorted(edges):
+            h.update(f'{node1}\t{node2}\n'.encode('utf-8'))
+        return h.hexdigest()
+
+    # return positions for key or None, mark entry as recently used
+    def get(self, key):
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return {node: tuple(xy) for node, xy in self.entries[key].items()}
+
+    # store positions for key and evict the least recently used entries,
+    # the file is written by flush
+    def put(self, key, pos):
+        self.entries[key] = {str(node): [float(x), float(y)] for node, (x, y) in pos.items()}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.dirty = True
+
+    # write the cache file if entries were added since it was read or written
+    def flush(self):
+        if self.dirty:
+            self.save()
+
+    def clear(self):
+        self.entries.clear()
+        self.save()
+
+    # read cache file, an unreadable file gives an empty cache
+    def load(self):
+        if self.filename is None or not os.path.exists(self.filename):
+            return
+        try:
+            with open(self.filename, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.entries = OrderedDict(list(entries.items())[-self.max_entries:])
+
+    # write cache file atomically, the cache stays in memory if the file cannot be written
+    def save(self):
+        if self.filename is None:
+            return
+        tmp = f'{self.filename}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp, self.filename)
+            self.dirty = False
+        except OSError:
+            pass
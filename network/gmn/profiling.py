@@ -0,0 +1,98 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# Opt-in timing of the stages of a gmn session. Enable it with
+# GMN_PROFILE=<file> or gmn --profile [<file>]; the timings are written to
+# the file on exit, as json, or as cProfile stats if the file ends in .prof.
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class Profiler:
+    def __init__(self, size=1000):
+        self.enabled = False
+        self.filename = None
+        self.cprofile = None
+        # ring buffer of (stage, start, seconds) of the most recent calls
+        self.records = deque(maxlen=size)
+        self.calls = {}
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    def enable(self, filename):
+        self.enabled = True
+        self.filename = filename
+        if filename.endswith('.prof'):
+            import cProfile
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    # time a block of code as one call of a stage
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self.lock:
+                self.records.append((name, time.time() - self.started - seconds, seconds))
+                self.calls[name] = self.calls.get(name, 0) + 1
+                self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    # calls and total, mean and last wall time in seconds per stage
+    def summary(self):
+        with self.lock:
+            last = {name: seconds for name, _, seconds in self.records}
+            return {name: {'calls': calls, 'total': self.totals[name], 'mean': self.totals[name] / calls,
+                           'last': last.get(name)}
+                    for name, calls in self.calls.items()}
+
+    # one line per stage for the stats panel
+    def text(self):
+        return '\n'.join(f'{name}: {s["calls"]}x {s["mean"] * 1000:.0f} ms'
+                         for name, s in sorted(self.summary().items()))
+
+    def dump(self):
+        if not self.enabled:
+            return
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.filename)
+            return
+        with self.lock:
+            records = [{'stage': name, 'start': start, 'seconds': seconds}
+                       for name, start, seconds in self.records]
+        with open(self.filename, 'w') as f:
+            json.dump({'stages': self.summary(), 'records': records}, f, indent=1)
+
+
+profiler = Profiler()
+if os.environ.get('GMN_PROFILE'):
+    profiler.enable(os.environ['GMN_PROFILE'])
+
+
+# decorator that times every call of a function as a stage
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
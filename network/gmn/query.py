@@ -0,0 +1,202 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# Lineage queries on the gmn graph, e.g.:
+# gmn-query descendants Zeus --depth 2
+# gmn-query path Perseus Heracles
+
+import argparse
+import networkx as nx
+import numpy as np
+from collections import deque
+from gmn.store import csr
+
+QUERIES = ['descendants', 'ancestors', 'partners', 'path']
+
+
+# ids of the set bits of a python int
+def bits_to_ids(bits):
+    if not bits:
+        return np.array([], dtype=np.int64)
+    raw = np.frombuffer(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder='little'))
+
+
+# transitive closure of a directed graph as one bitset per node, computed on
+# the condensation so that cycles in the data do not need special care
+def closure_bits(n_nodes, src, dst):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(n_nodes))
+    graph.add_edges_from(zip(src.tolist(), dst.tolist()))
+    condensed = nx.condensation(graph)
+    members = {c: sum(1 << i for i in condensed.nodes[c]['members']) for c in condensed}
+    reach = {}
+    for c in reversed(list(nx.topological_sort(condensed))):
+        bits = members[c] if len(condensed.nodes[c]['members']) > 1 else 0
+        for succ in condensed.successors(c):
+            bits |= members[succ] | reach[succ]
+        reach[c] = bits
+    closure = [0] * n_nodes
+    for i in range(n_nodes):
+        closure[i] = reach[condensed.graph['mapping'][i]] & ~(1 << i)
+    return closure
+
+
+# Precomputed index for kinship queries on a GraphStore. Descendant edges go
+# from parent to child, partner edges are treated as undirected.
+class KinshipIndex:
+    def __init__(self, store):
+        self.store = store
+        n = store.n_nodes
+        codes = {cat: i for i, cat in enumerate(store.edge_categories)}
+        descendant = store.edge_category == codes.get('descendant', -1)
+        partner = store.edge_category == codes.get('partner', -1)
+        self.parent, self.child = store.src[descendant], store.dst[descendant]
+        self.child_ptr, self.child_order = csr(self.parent, n)
+        self.parent_ptr, self.parent_order = csr(self.child, n)
+        self.descendant_bits = closure_bits(n, self.parent, self.child)
+        self.ancestor_bits = closure_bits(n, self.child, self.parent)
+
+        # partner closure: connected components of the undirected partner graph
+        partners = nx.Graph()
+        partners.add_nodes_from(range(n))
+        partners.add_edges_from(zip(store.src[partner].tolist(), store.dst[partner].tolist()))
+        self.partner_component = np.zeros(n, dtype=np.int64)
+        for label, component in enumerate(nx.connected_components(partners)):
+            self.partner_component[list(component)] = label
+
+        # undirected adjacency over all relations for shortest paths
+        src = np.concatenate([store.src, store.dst])
+        dst = np.concatenate([store.dst, store.src])
+        self.all_ptr, self.all_order = csr(src, n)
+        self.all_dst = dst
+        self.all_edge = np.concatenate([np.arange(store.n_edges)] * 2)
+        self.cache = {}
+
+    def node_id(self, name):
+        i = self.store.node_id(name)
+        if i is None:
+            raise KeyError(f'{name} is not in the network')
+        return i
+
+    # breadth first search along parent -> child (or child -> parent) edges up to depth
+    def walk(self, i, depth, ptr, order, targets):
+        seen = {i}
+        frontier = [i]
+        for _ in range(depth):
+            following = []
+            for j in frontier:
+                for k in targets[order[ptr[j]:ptr[j + 1]]].tolist():
+                    if k not in seen:
+                        seen.add(k)
+                        following.append(k)
+            if not following:
+                break
+            frontier = following
+        seen.discard(i)
+        return np.array(sorted(seen), dtype=np.int64)
+
+    # ids of all descendants, or of those at most depth generations away
+    def descendants(self, name, depth=None):
+        i = self.node_id(name)
+        if depth is None:
+            return bits_to_ids(self.descendant_bits[i])
+        key = ('descendants', i, depth)
+        if key not in self.cache:
+            self.cache[key] = self.walk(i, depth, self.child_ptr, self.child_order, self.child)
+        return self.cache[key]
+
+    def ancestors(self, name, depth=None):
+        i = self.node_id(name)
+        if depth is None:
+            return bits_to_ids(self.ancestor_bits[i])
+        key = ('ancestors', i, depth)
+        if key not in self.cache:
+            self.cache[key] = self.walk(i, depth, self.parent_ptr, self.parent_order, self.parent)
+        return self.cache[key]
+
+    # everybody connected to a node through partner relations
+    def partners(self, name):
+        i = self.node_id(name)
+        ids = np.flatnonzero(self.partner_component == self.partner_component[i])
+        return ids[ids != i]
+
+    def is_descendant(self, name, of):
+        return bool(self.descendant_bits[self.node_id(of)] >> self.node_id(name) & 1)
+
+    # shortest chain of relations between two nodes as a list of (name, relation, name)
+    def shortest_path(self, name1, name2):
+        start, goal = self.node_id(name1), self.node_id(name2)
+        key = ('path', start, goal)
+        if key in self.cache:
+            return self.cache[key]
+        previous = {start: None}
+        queue = deque([start])
+        while queue and goal not in previous:
+            j = queue.popleft()
+            for pos in range(self.all_ptr[j], self.all_ptr[j + 1]):
+                k = int(self.all_dst[self.all_order[pos]])
+                if k not in previous:
+                    previous[k] = (j, int(self.all_edge[self.all_order[pos]]))
+                    queue.append(k)
+        steps = []
+        if goal in previous:
+            k = goal
+            while previous[k] is not None:
+                j, edge = previous[k]
+                steps.append((self.store.names[j], self.relation(j, edge), self.store.names[k]))
+                k = j
+            steps.reverse()
+        self.cache[key] = steps if goal in previous else None
+        return self.cache[key]
+
+    # how node j is related to the other end of an edge
+    def relation(self, j, edge):
+        category = self.store.edge_categories[self.store.edge_category[edge]]
+        if category == 'descendant':
+            return 'parent of' if self.store.src[edge] == j else 'child of'
+        return f'{category} of'
+
+
+# run a query and return (ids, text)
+def run_query(index, query, names, depth=None):
+    if query == 'path':
+        if len(names) != 2:
+            raise ValueError('path needs two names')
+        steps = index.shortest_path(*names)
+        if steps is None:
+            return np.array([], dtype=np.int64), f'no path between {names[0]} and {names[1]}'
+        ids = [index.node_id(names[0])] + [index.node_id(step[2]) for step in steps]
+        return np.array(ids, dtype=np.int64), '\n'.join(' '.join(step) for step in steps)
+    if len(names) != 1:
+        raise ValueError(f'{query} needs one name')
+    if query == 'partners':
+        ids = index.partners(names[0])
+    else:
+        ids = getattr(index, query)(names[0], depth)
+    return ids, '\n'.join(str(name) for name in sorted(index.store.names[ids]))
+
+
+def main():
+    from gmn.gmn import GmnModel
+    parser = argparse.ArgumentParser(description='Lineage queries on the gmn network.')
+    parser.add_argument('query', choices=QUERIES)
+    parser.add_argument('names', nargs='+', help='one name, two for path')
+    parser.add_argument('--depth', type=int, default=None, help='maximum number of generations')
+    parser.add_argument('--assets', default=None, help='directory with nodes.csv and edges.csv')
+    args = parser.parse_args()
+    index = KinshipIndex(GmnModel(dd=args.assets).store)
+    try:
+        ids, text = run_query(index, args.query, args.names, args.depth)
+    except (KeyError, ValueError) as e:
+        parser.error(str(e).strip("'"))
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
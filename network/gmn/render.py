@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+# Headless batch rendering of gmn network snapshots, e.g.:
+# gmn-render --by-category -o figures --format png svg
+
+import argparse
+import os
+import matplotlib
+matplotlib.use('Agg')
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from gmn.gmn import GmnModel, plot_network
+from gmn.layout import LAYOUT_ENGINES
+
+# one model per worker process, created by init_worker
+model = None
+
+
+def init_worker(layout, dd):
+    global model
+    model = GmnModel(incremental=False, layout=layout, dd=dd)
+
+
+# render the network of one selection of nodes to one file per format, the
+# layout is returned for the layout cache of the main process
+def render(label, names, outdir, formats):
+    model.store.show[:] = False
+    model.store.set_show(names)
+    model.update_edges()
+    if model.edges_selected.empty:
+        return label, [], None
+    # every selection gets its own layout instead of a warm start from the previous job
+    model.network = []
+    model.pos = []
+    model.generate_network()
+    fig = Figure(figsize=(8, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    plot_network(ax, model.network, model.pos)
+    ax.set_title(label)
+    filenames = []
+    for fmt in formats:
+        filename = os.path.join(outdir, f'{label}.{fmt}')
+        fig.savefig(filename)
+        filenames.append(filename)
+    return label, filenames, (model.layout_cache.key(model.network.edges, model.layout), model.pos)
+
+
+# list of (label, names) from the command line arguments
+def get_selections(args, nodes):
+    selections = []
+    if args.by_category:
+        for cat, subset in nodes[nodes['enabled']].groupby('category'):
+            selections.append((cat, subset['name'].tolist()))
+    lines = list(args.select)
+    if args.file:
+        with open(args.file, 'r') as f:
+            lines += [line.strip() for line in f if line.strip()]
+    for line in lines:
+        names = [name.strip() for name in line.split(',') if name.strip()]
+        selections.append(('_'.join(names) if len(names) <= 3 else f'selection_{len(selections):03d}', names))
+    return selections
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render gmn networks to files without a gui.')
+    parser.add_argument('--by-category', action='store_true', help='one figure per node category')
+    parser.add_argument('--select', action='append', default=[], metavar='NAMES',
+                        help='comma separated node names, can be repeated')
+    parser.add_argument('--file', help='file with one comma separated selection per line')
+    parser.add_argument('-o', '--outdir', default='.', help='output directory')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg', 'pdf'])
+    parser.add_argument('--layout', choices=sorted(LAYOUT_ENGINES), default=None)
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--assets', default=None, help='directory with nodes.csv and edges.csv')
+    args = parser.parse_args()
+
+    data = GmnModel(layout=args.layout, dd=args.assets)
+    selections = get_selections(args, data.nodes)
+    if not selections:
+        parser.error('nothing to render, use --by-category, --select or --file')
+    os.makedirs(args.outdir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=args.jobs, initializer=init_worker,
+                             initargs=(data.layout, data.dd)) as executor:
+        futures = [executor.submit(render, label, names, args.outdir, args.format) for label, names in selections]
+        for future in futures:
+            label, filenames, layout = future.result()
+            # only the main process writes the layout cache
+            if layout is not None:
+                data.layout_cache.put(*layout)
+            if filenames:
+                print(f'{label}: {", ".join(filenames)}')
+            else:
+                print(f'{label}: no edges for this selection')
+    data.layout_cache.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from gmn.store import GraphStore
+
+SNAPSHOT_VERSION = 1
+
+
+# sha1 of the content of a file
+def file_hash(filename):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def file_stamp(filename):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha1': file_hash(filename)}
+
+
+# columns of a dataframe as arrays: numbers as they are, everything else as
+# category codes with the categories in the metadata
+def frame_arrays(df, prefix):
+    arrays = {}
+    columns = []
+    for i, column in enumerate(df.columns):
+        key = f'{prefix}.{i}'
+        values = df[column]
+        if values.dtype.kind in 'biuf':
+            arrays[key] = values.to_numpy()
+            columns.append({'name': column, 'key': key})
+        else:
+            categorical = pd.Categorical(values)
+            arrays[key] = categorical.codes
+            columns.append({'name': column, 'key': key,
+                            'categories': [str(cat) for cat in categorical.categories]})
+    return arrays, columns
+
+
+def frame_from_arrays(arrays, columns):
+    data = {}
+    for column in columns:
+        values = arrays[column['key']]
+        if 'categories' in column:
+            categorical = pd.Categorical.from_codes(values, column['categories'])
+            data[column['name']] = np.asarray(categorical, dtype=object)
+        else:
+            data[column['name']] = np.asarray(values)
+    return pd.DataFrame(data)
+
+
+# Binary snapshot of the parsed nodes.csv and edges.csv with the graph store,
+# kept in assets/snapshot. Arrays are saved as .npy files, so that they can be
+# memory mapped, in a folder named after the hash of the csv files.
+# meta.json records size, mtime and hash of the csv files: the snapshot is
+# used if size and mtime match, or if only the mtime changed but the content
+# did not. The positions of the last layout are kept in layout.npz.
+class Snapshot:
+    def __init__(self, dd):
+        self.sources = {name: os.path.join(dd, name) for name in ('nodes.csv', 'edges.csv')}
+        self.directory = os.path.join(dd, 'snapshot')
+        self.meta_file = os.path.join(self.directory, 'meta.json')
+        self.layout_file = os.path.join(self.directory, 'layout.npz')
+
+    # metadata of the snapshot if it matches the csv files, None otherwise
+    def check(self):
+        try:
+            with open(self.meta_file, 'r') as f:
+                meta = json.load(f)
+            if meta.get('version') != SNAPSHOT_VERSION:
+                return None
+            touched = False
+            for name, filename in self.sources.items():
+                stamp = meta['sources'][name]
+                stat = os.stat(filename)
+                if stat.st_size != stamp['size']:
+                    return None
+                if stat.st_mtime_ns != stamp['mtime']:
+                    if file_hash(filename) != stamp['sha1']:
+                        return None
+                    stamp['mtime'] = stat.st_mtime_ns
+                    touched = True
+        except (OSError, ValueError, KeyError):
+            return None
+        if touched:
+            self.write_meta(meta)
+        return meta
+
+    # nodes, edges and store from the snapshot, None if there is no valid snapshot
+    def load(self):
+        meta = self.check()
+        if meta is None:
+            return None
+        folder = os.path.join(self.directory, meta['digest'])
+        try:
+            arrays = {key: np.load(os.path.join(folder, f'{key}.npy'), mmap_mode='r')
+                      for key in meta['arrays']}
+        except (OSError, ValueError):
+            return None
+        nodes = frame_from_arrays(arrays, meta['nodes'])
+        edges = frame_from_arrays(arrays, meta['edges'])
+        store = GraphStore.from_state({key[6:]: arrays[key] for key in arrays if key.startswith('store.')},
+                                      meta['store'])
+        return nodes, edges, store
+
+    # write a snapshot, the snapshot is skipped if the assets folder is not writable
+    def save(self, nodes, edges, store):
+        try:
+            sources = {name: file_stamp(filename) for name, filename in self.sources.items()}
+            digest = hashlib.sha1(''.join(sources[name]['sha1'] for name in sorted(sources)).encode()).hexdigest()
+            arrays, nodes_columns = frame_arrays(nodes, 'nodes')
+            edge_arrays, edges_columns = frame_arrays(edges, 'edges')
+            arrays.update(edge_arrays)
+            store_arrays, store_lists = store.state()
+            arrays.update({f'store.{key}': values for key, values in store_arrays.items()})
+
+            # arrays go to a temporary folder first, so that readers never see a partial snapshot
+            folder = os.path.join(self.directory, digest)
+            tmp = f'{folder}.{os.getpid()}.tmp'
+            os.makedirs(tmp, exist_ok=True)
+            for key, values in arrays.items():
+                np.save(os.path.join(tmp, f'{key}.npy'), np.ascontiguousarray(values))
+            if os.path.exists(folder):
+                shutil.rmtree(tmp)
+            else:
+                os.rename(tmp, folder)
+            self.write_meta({'version': SNAPSHOT_VERSION, 'digest': digest, 'sources': sources,
+                             'arrays': sorted(arrays), 'nodes': nodes_columns, 'edges': edges_columns,
+                             'store': store_lists})
+        except OSError:
+            return
+        # snapshots of older csv files
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name != digest and os.path.isdir(path) and not name.endswith('.tmp'):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def write_meta(self, meta):
+        tmp = f'{self.meta_file}.{os.getpid()}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.meta_file)
+        except OSError:
+            pass
+
+    # layout cache key and positions of the last layout, None if there is none
+    def load_layout(self):
+        try:
+            with np.load(self.layout_file) as data:
+                key = str(data['key'])
+                pos = {name: tuple(xy) for name, xy in zip(data['names'].tolist(), data['xy'].tolist())}
+        except (OSError, ValueError, KeyError):
+            return None
+        return key, pos
+
+    def save_layout(self, key, pos):
+        tmp = f'{self.layout_file}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                np.savez(f, key=np.array(key), names=np.array([str(name) for name in pos], dtype=str),
+                         xy=np.array(list(pos.values()), dtype=float).reshape(-1, 2))
+            os.replace(tmp, self.layout_file)
+        except OSError:
+            pass
@@ -0,0 +1,205 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# vim:fenc=utf-8
+#
+# Copyright © 2020 Nicole Eichert <n.eichert@googlemail.com>
+#
+# Distributed under terms of the MIT license.
+
+import numpy as np
+import pandas as pd
+
+
+# compressed sparse rows: edge positions grouped by node id
+def csr(keys, n_nodes):
+    order = np.argsort(keys, kind='stable').astype(np.int32)
+    ptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_nodes), out=ptr[1:])
+    return ptr, order
+
+
+# concatenate the csr rows of the given node ids
+def gather(ptr, values, ids):
+    starts = ptr[ids]
+    lengths = ptr[ids + 1] - starts
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return values[np.repeat(starts, lengths) + offsets]
+
+
+# Compact store of the gmn graph. Node names are interned to integer ids,
+# names from nodes.csv first, followed by names that only appear in edges.csv.
+# Edges are kept as int32 source/target arrays in the order of the edges
+# dataframe, with csr adjacency in both directions. Node degree, the enabled
+# flag and the nodes of each category are derived once from the edge arrays
+# and kept up to date by add_edges.
+class GraphStore:
+    # arrays saved in a snapshot next to the names and the category members
+    state_arrays = ['node_category', 'src', 'dst', 'edge_category', 'out_ptr', 'out_edges',
+                    'in_ptr', 'in_edges', 'degree', 'enabled']
+
+    def __init__(self, nodes, edges):
+        listed = nodes['name'].tolist()
+        extra = pd.unique(pd.concat([edges['node1'], edges['node2']]))
+        known = set(listed)
+        self.names = np.array(listed + [name for name in extra if name not in known], dtype=object)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.n_nodes = len(self.names)
+
+        # node attributes, category -1 for nodes that are not in nodes.csv
+        categories = pd.Categorical(nodes['category'])
+        self.categories = list(categories.categories)
+        self.category_ids = {cat: i for i, cat in enumerate(self.categories)}
+        self.node_category = np.full(self.n_nodes, -1, dtype=np.int16)
+        self.node_category[:len(listed)] = categories.codes
+
+        # edges
+        index = pd.Index(self.names)
+        self.src = index.get_indexer(edges['node1']).astype(np.int32)
+        self.dst = index.get_indexer(edges['node2']).astype(np.int32)
+        edge_categories = pd.Categorical(edges['category'])
+        self.edge_categories = list(edge_categories.categories)
+        self.edge_category = edge_categories.codes.astype(np.int8)
+        self.out_ptr, self.out_edges = csr(self.src, self.n_nodes)
+        self.in_ptr, self.in_edges = csr(self.dst, self.n_nodes)
+
+        # nodes with at least one edge are enabled, only those in nodes.csv can be shown
+        self.degree = np.diff(self.out_ptr) + np.diff(self.in_ptr)
+        self.enabled = (self.degree > 0) & (self.node_category >= 0)
+        self.show = self.enabled.copy()
+
+        # nodes of each category, enabled ones first, then by name
+        order = self.sort_nodes(np.flatnonzero(self.node_category >= 0))
+        counts = np.bincount(self.node_category[order], minlength=len(self.categories))
+        self.members = dict(zip(self.categories, np.split(order, np.cumsum(counts)[:-1])))
+
+        # prefix index over lower case names, built on first search
+        self.sorted_names = None
+        self.sorted_ids = None
+
+    # arrays and category lists of the store
+    def state(self):
+        arrays = {key: getattr(self, key) for key in self.state_arrays}
+        # fixed width strings, object arrays cannot be memory mapped
+        arrays['names'] = np.array([str(name) for name in self.names], dtype=str)
+        members = [self.members[cat] for cat in self.categories]
+        arrays['member_order'] = np.concatenate(members + [np.array([], dtype=np.int64)])
+        arrays['member_counts'] = np.array([len(ids) for ids in members], dtype=np.int64)
+        return arrays, {'categories': self.categories, 'edge_categories': self.edge_categories}
+
+    # store from the output of state, the arrays may be read-only memory maps
+    @classmethod
+    def from_state(cls, arrays, lists):
+        store = cls.__new__(cls)
+        for key in cls.state_arrays:
+            setattr(store, key, arrays[key])
+        store.names = np.asarray(arrays['names']).astype(object)
+        store.ids = {name: i for i, name in enumerate(store.names)}
+        store.n_nodes = len(store.names)
+        store.categories = list(lists['categories'])
+        store.category_ids = {cat: i for i, cat in enumerate(store.categories)}
+        store.edge_categories = list(lists['edge_categories'])
+        # node attributes are changed in place
+        store.degree = np.array(arrays['degree'])
+        store.enabled = np.array(arrays['enabled'])
+        store.show = store.enabled.copy()
+        splits = np.split(arrays['member_order'], np.cumsum(arrays['member_counts'])[:-1])
+        store.members = dict(zip(store.categories, splits))
+        store.sorted_names = None
+        store.sorted_ids = None
+        return store
+
+    @property
+    def n_edges(self):
+        return len(self.src)
+
+    def node_id(self, name):
+        return self.ids.get(name)
+
+    # category of a node in nodes.csv, None for unknown names
+    def category_of(self, name):
+        i = self.ids.get(name)
+        if i is None or self.node_category[i] < 0:
+            return None
+        return self.categories[self.node_category[i]]
+
+    # ids of all nodes of a category
+    def category_members(self, category):
+        return self.members[category]
+
+    # node ids ordered by category, enabled nodes first and then by name
+    def sort_nodes(self, ids):
+        ids = ids[np.argsort(self.names[ids], kind='stable')]
+        return ids[np.lexsort((~self.enabled[ids], self.node_category[ids]))]
+
+    # intern names that are not in the store yet
+    def add_names(self, names):
+        new = [name for name in pd.unique(names) if name not in self.ids]
+        if not new:
+            return
+        self.ids.update((name, self.n_nodes + i) for i, name in enumerate(new))
+        self.names = np.concatenate([self.names, np.array(new, dtype=object)])
+        self.n_nodes = len(self.names)
+        grow = len(new)
+        self.node_category = np.concatenate([self.node_category, np.full(grow, -1, dtype=np.int16)])
+        self.degree = np.concatenate([self.degree, np.zeros(grow, dtype=self.degree.dtype)])
+        self.enabled = np.concatenate([self.enabled, np.zeros(grow, dtype=bool)])
+        self.show = np.concatenate([self.show, np.zeros(grow, dtype=bool)])
+
+    # append edges in the order of the edges dataframe, degree, enabled flags
+    # and category members are only updated for the nodes of the new edges
+    def add_edges(self, edges):
+        if len(edges) == 0:
+            return
+        self.add_names(pd.concat([edges['node1'], edges['node2']]))
+        index = pd.Index(self.names)
+        src = index.get_indexer(edges['node1']).astype(np.int32)
+        dst = index.get_indexer(edges['node2']).astype(np.int32)
+        for category in pd.unique(edges['category']):
+            if category not in self.edge_categories:
+                self.edge_categories.append(category)
+        codes = pd.Categorical(edges['category'], categories=self.edge_categories).codes
+        self.src = np.concatenate([self.src, src])
+        self.dst = np.concatenate([self.dst, dst])
+        self.edge_category = np.concatenate([self.edge_category, codes.astype(np.int8)])
+        self.out_ptr, self.out_edges = csr(self.src, self.n_nodes)
+        self.in_ptr, self.in_edges = csr(self.dst, self.n_nodes)
+
+        self.degree += np.bincount(src, minlength=self.n_nodes) + np.bincount(dst, minlength=self.n_nodes)
+        touched = np.unique(np.concatenate([src, dst]))
+        touched = touched[~self.enabled[touched] & (self.node_category[touched] >= 0)]
+        self.enabled[touched] = True
+        for c in np.unique(self.node_category[touched]):
+            category = self.categories[c]
+            self.members[category] = self.sort_nodes(self.members[category])
+
+    # ids of nodes in nodes.csv whose name starts with prefix, case insensitive
+    def prefix_search(self, prefix, limit=200):
+        if self.sorted_names is None:
+            listed = np.flatnonzero(self.node_category >= 0)
+            lower = np.array([str(name).lower() for name in self.names[listed]], dtype=str)
+            order = np.argsort(lower, kind='stable')
+            self.sorted_names = lower[order]
+            self.sorted_ids = listed[order]
+        prefix = prefix.lower()
+        start = np.searchsorted(self.sorted_names, prefix, side='left')
+        stop = np.searchsorted(self.sorted_names, prefix + '\U0010ffff', side='left')
+        return self.sorted_ids[start:min(stop, start + limit)]
+
+    def set_show(self, names, value=True):
+        ids = [self.ids[name] for name in names if name in self.ids]
+        self.show[ids] = value
+
+    # boolean mask over all edges that start or end at one of the given nodes
+    def edge_mask(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = np.zeros(self.n_edges, dtype=bool)
+        mask[gather(self.out_ptr, self.out_edges, ids)] = True
+        mask[gather(self.in_ptr, self.in_edges, ids)] = True
+        return mask
+
+    # ids of the successors and predecessors of a node
+    def successors(self, i):
+        return self.dst[self.out_edges[self.out_ptr[i]:self.out_ptr[i + 1]]]
+
+    def predecessors(self, i):
+        return self.src[self.in_edges[self.in_ptr[i]:self.in_ptr[i + 1]]]
@@ -30,6 +30,10 @@ setuptools.setup(
         "pillow",
     ],
     entry_points={
-        'console_scripts': ['gmn = gmn.gmn:main']
+        'console_scripts': [
+            'gmn = gmn.gmn:main',
+            'gmn-render = gmn.render:main',
+            'gmn-query = gmn.query:main',
+        ]
     }
 )
\ No newline at end of file
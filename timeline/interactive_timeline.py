@@ -10,6 +10,7 @@ import dash
 import dash_core_components as dcc
 import dash_html_components as html
 from dash.dependencies import Input, Output
+from row_packing import pack_rows
 pio.renderers.default = "browser"
 pd.set_option('mode.chained_assignment', None)
 
@@ -43,32 +44,21 @@ def prep_data():
     return df
 
 def set_ypos():
-    # initialize parameters
-    ypos_arr = np.array([0])
+    ypos = np.zeros(len(df), dtype=int)
     ypos_group = 0
-    ymax = 0
     # loop over categories
     for cat in np.unique(df['timeline_type_id'].values):
         print(cat)
-        group = df[df.timeline_type_id == cat]
-        filled = pd.DataFrame(columns=['ypos', 'on', 'off'])
-        # draw event as rectangle
-        for ind, row in group.iterrows():
-            # draw the event in the next free row
-            ypos = ypos_group + 1
-            while any((filled['ypos'] == ypos) & (((filled['on'] < (row['date_from'] - 1)) & ((row['date_from'] - 1) < filled['off'])) | ((filled['on'] < (row['date_to'] - 1)) & ((row['date_from'] + row['duration'] + 1) < filled['off'])))):
-                ypos += 1
-            if ypos > ymax:
-                ymax = ypos
-            filled = filled.append({'ypos': ypos, 'on': row['date_from'], 'off': row['date_from'] + row['duration']}, ignore_index=True)
-            ypos_arr = np.append(ypos_arr, ypos)
+        group = (df.timeline_type_id == cat).values
+        # draw every event in the next free row
+        starts = df['date_from'][group].to_numpy(dtype=float)
+        rows, n_rows = pack_rows(starts, starts + df['duration'][group].to_numpy(dtype=float), gap=1)
+        ypos[group] = rows + ypos_group + 1
         # start a new cateory in a new row
-        ypos_group = ymax
-    ypos_arr = np.delete(ypos_arr, 0)
-    df['ypos'] = ypos_arr
+        ypos_group += n_rows
+    df['ypos'] = ypos
     df.to_csv(os.path.join(os.path.dirname(sys.argv[0]), 'timeline_prep.csv'))
 
-
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 
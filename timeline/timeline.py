@@ -13,6 +13,7 @@ import requests
 from bs4 import BeautifulSoup
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../')
 from my_functions import img_google
+from row_packing import ADJACENT, category_gap, pack_rows
 pd.set_option('mode.chained_assignment', None)
 
 # TODO data browser
@@ -210,37 +211,30 @@ class timeline(tk.Tk):
         # initialize parameters
         my_patches = []
         ypos_group = 0
-        ymax = 0
 
         # loop over categories
         for i, cat_row in self.df_cat.iterrows():
             group = self.df[self.df.category == cat_row.category]
-            filled = pd.DataFrame(columns=['ypos', 'on', 'off'])
+            # draw every event in the next free row
+            starts = group['yearOn'].to_numpy(dtype=float)
+            rows, n_rows = pack_rows(starts, starts + group['length'].to_numpy(dtype=float),
+                                     category_gap(cat_row.category))
             # draw event as rectangle
-            for ind, row in group.iterrows():
-                # draw the event in the next free row
-                ypos = ypos_group + 1
+            for (ind, row), ypos in zip(group.iterrows(), rows + ypos_group + 1):
                 # add subsequent pathes directly
-                if cat_row.category in ['supereon', 'eon', 'era', 'period', 'epoch']:
-                    while any((filled['ypos'] == ypos) & (((filled['on'] < (row['yearOn'])) & ((row['yearOn']) < filled['off'])) | ((filled['on'] < (row['yearOff'])) & ((row['yearOn'] + row['length']) < filled['off'])))):
-                        ypos += 1
+                if cat_row.category in ADJACENT:
                     rect = patches.Rectangle((int(row['yearOn']), -(ypos + linewidth)), row['length'], linewidth * 0.9,
                                              facecolor=cat_row.color,
                                              edgecolor='black')
                 # start new row for short events
                 else:
-                    while any((filled['ypos'] == ypos) & (((filled['on'] < (row['yearOn'] - 1)) & ((row['yearOn'] - 1) < filled['off'])) | ((filled['on'] < (row['yearOff'] - 1)) & ((row['yearOn'] + row['length'] + 1) < filled['off'])))):
-                        ypos += 1
                     rect = patches.Rectangle((int(row['yearOn']), -(ypos + linewidth)), row['length'], linewidth * 0.9,
                                              facecolor=cat_row.color)
-                if ypos > ymax:
-                    ymax = ypos
                 ax.add_patch(rect)
                 my_patches.append(rect)
-                filled = filled.append({'ypos': ypos, 'on': row['yearOn'], 'off': row['yearOn'] + row['length']}, ignore_index=True)
 
             # start a new cateory in a new row
-            ypos_group = ymax
+            ypos_group += n_rows
 
         ax.set_xlim(self.year_from_var.get(), self.year_to_var.get())
         ax.set_ylim(-(ypos_group + 1), 0)